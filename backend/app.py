@@ -1,24 +1,43 @@
 from gevent import monkey
 monkey.patch_all()
 
-from flask import Flask, jsonify, request
+# Before the other imports: several modules read their settings from the environment at import time
+from dotenv import load_dotenv
+load_dotenv()
+
+from flask import Flask, jsonify, request, Response, stream_with_context, url_for, g
 from flask_cors import CORS
 from quizGenerator import generate_quiz
-from courseGenerator import gen_roadmap, gen_course
-from chatbot import generate_bot_response
+from courseGenerator import gen_roadmap, gen_course, gen_module_descriptions, MODULE_PROMPT_VERSION
+from chatbot import generate_bot_response, stream_bot_response, FALLBACK_RESPONSE
+from chatSessions import chat_sessions
+from courseEngine import build_detailed_course, course_skeleton, iter_descriptions, has_descriptions, PLACEHOLDER, GEN_MODE
+from descriptionCache import description_cache
+from topicCache import topic_cache
+from courseStore import create_course_store, parse_fields, summarize, StoreError, ROADMAP, COURSE, COURSE_PAGE_SIZE, MAX_COURSE_PAGE_SIZE
+from roadmapCache import roadmap_cache
+from userCache import user_cache
+from courseCodec import json_response, compress_response
+from singleFlight import KeyedLock
+from quizPool import QuizPool
+from jobQueue import JobQueue, QUEUED
+from modelGateway import gateway
+from resilience import gemini_breaker
+from passwordHasher import PasswordHasher, BCRYPT_LOG_ROUNDS
+from instrumentation import registry, request_profiler, REQUEST_SECONDS
+import courseGenerator
+import quizGenerator
+from contextlib import contextmanager
 import json
-from flask_sqlalchemy import SQLAlchemy
+from models import db, User
 from flask_bcrypt import Bcrypt
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt, verify_jwt_in_request
 import os
+import threading
+import time
 import requests
-from dotenv import load_dotenv
+from clients import clients
 
-load_dotenv()
-
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
 app = Flask(__name__)
 CORS(app)  # Enable CORS to allow cross-origin requests from React
 
@@ -38,39 +57,116 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
 
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'connect_args': {
-        'ssl': {
-            'ca': ca_cert  
+# Connection pool of the MySQL server: keep TLS connections open between requests,
+# test them before use and replace them before the server drops idle ones
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 280))
+
+# TLS and pool settings only apply to the MySQL server; a local SQLite URL needs none
+if not (app.config['SQLALCHEMY_DATABASE_URI'] or '').startswith('sqlite'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+        'connect_args': {
+            'ssl': {
+                'ca': ca_cert  
+            }
         }
     }
-}
 
+app.config['BCRYPT_LOG_ROUNDS'] = BCRYPT_LOG_ROUNDS
+
+# Bearer token required to read /metrics; open when unset (e.g. behind a private network)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
 
 
 
-# Cloudinary configuration
-cloudinary.config(
-    cloud_name=os.getenv('cloud_name'),
-    api_key=os.getenv('api_key'),
-    api_secret=os.getenv('api_secret')
-)
+
+# Gemini and Cloudinary clients are imported and configured on first use, unless PRELOAD_CLIENTS asks for them now
+clients.preload()
 
 # Initialize Extensions
-db = SQLAlchemy(app)
+db.init_app(app)
 bcrypt = Bcrypt(app)
+password_hasher = PasswordHasher(bcrypt)
 jwt = JWTManager(app)
-
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(50), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password = db.Column(db.String(128), nullable=False)
-    roadmap = db.Column(db.Text, nullable=True)  # Store roadmap file URL
-    course = db.Column(db.Text, nullable=True)
-
-    def __repr__(self):
-        return f"<User {self.username}>"
+course_store = create_course_store(db)
+quiz_pool = QuizPool(generate_quiz)
+job_queue = JobQueue()
+
+
+@app.before_request
+def start_timer():
+    g.request_started_at = time.perf_counter()
+    g.profiler = request_profiler.start()
+
+
+@app.after_request
+def record_request(response):
+    # Registered before compress, so it runs after it and the timing includes compression
+    started = g.pop('request_started_at', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_SECONDS.observe(elapsed, route=route, method=request.method, status=response.status_code)
+    profiler = g.pop('profiler', None)
+    if profiler:
+        request_profiler.finish(profiler, f'{request.method} {route}', elapsed * 1000)
+    return response
+
+
+@app.teardown_request
+def release_profiler(error=None):
+    # A request whose after_request hooks did not all run must still free the profiler
+    profiler = g.pop('profiler', None)
+    if profiler:
+        request_profiler.discard(profiler)
+
+
+@app.after_request
+def compress(response):
+    # Courses and roadmaps are large, repetitive JSON; gzip them for clients that accept it
+    return compress_response(request, response)
+
+
+# Stats kept by the caches, the gateway and the queues, read when /metrics is scraped
+single_flights = {fn.__name__: fn.flight for fn in (
+    courseGenerator.gen_roadmap, courseGenerator.gen_course, courseGenerator.gen_module_descriptions,
+    quizGenerator.generate_quiz)}
+registry.callback('cache_hit_ratio', 'Hits over lookups since the process started', ('cache',), lambda: {
+    ('description',): round(description_cache.hit_ratio(), 4),
+    ('topic',): round(topic_cache.hit_ratio(), 4),
+    ('roadmap',): round(roadmap_cache.hit_ratio(), 4),
+    ('user',): round(user_cache.hit_ratio(), 4),
+})
+registry.callback('cache_events_total', 'Cache hits, misses, writes and evictions', ('cache', 'event'), lambda: {
+    **{('description', name): value for name, value in description_cache.stats.items()},
+    **{('topic', name): value for name, value in topic_cache.stats.items()},
+    **{('roadmap', name): value for name, value in roadmap_cache.stats.items()},
+    **{('quiz_pool', name): value for name, value in quiz_pool.stats.items()},
+    **{('user', name): value for name, value in user_cache.stats.items()},
+    **{('chat_session', name): value for name, value in chat_sessions.stats.items()},
+}, kind='counter')
+registry.callback('single_flight_calls_total', 'Generator calls made, and calls that joined one in flight',
+                  ('function', 'type'), lambda: {
+    (name, kind): value for name, flight in single_flights.items() for kind, value in flight.stats.items()
+}, kind='counter')
+registry.callback('llm_queue_depth', 'Gemini calls waiting for the rate limiter', ('kind',), lambda: {
+    (kind,): depth for kind, depth in gateway.metrics()['queue_depth'].items()
+})
+registry.callback('llm_circuit_open', 'Gemini circuit breaker state (0 closed, 1 half open, 2 open)', (), lambda: {
+    (): {'closed': 0, 'half_open': 1, 'open': 2}[gemini_breaker.state]
+})
+registry.callback('llm_circuit_events_total', 'Gemini circuit breaker outcomes', ('event',), lambda: {
+    (name,): value for name, value in gemini_breaker.stats.items()
+}, kind='counter')
+registry.callback('job_queue_depth', 'Jobs waiting to run', (), lambda: {(): job_queue.depth()})
 
 
 @app.route('/api', methods=['GET'])
@@ -87,7 +183,7 @@ def register():
     if User.query.filter_by(email=email).first():
         return jsonify({'error': 'Email already exists'}), 400
     
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+    hashed_password = password_hasher.hash(password)
     new_user = User(username=username, email=email, password=hashed_password)
     
     db.session.add(new_user)
@@ -104,7 +200,7 @@ def login():
     
     user = User.query.filter_by(email=email).first()
     
-    if not user or not bcrypt.check_password_hash(user.password, password):
+    if not user or not password_hasher.check(user.password, password):
         return jsonify({'error': 'Invalid email or password'}), 401
     
     access_token = create_access_token(
@@ -128,110 +224,168 @@ def login():
         'email': email
     }), 200
 
-# Define the maximum number of retries and the delay between retries
-MAX_RETRIES = 100
+def safe_gen_course(heading):
+    """Return the cached description of a heading, or generate it; a placeholder if generation fails.
+
+    gen_course already retries with backoff and fails fast while Gemini is unhealthy.
+    """
+    cached = description_cache.get(heading)
+    if cached:
+        return cached
+
+    try:
+        description = gen_course(heading)
+    except Exception as e:
+        print(f"Error in gen_course for heading '{heading}': {e}")
+        return PLACEHOLDER
+
+    if description:
+        description_cache.set(heading, description)
+    return description or PLACEHOLDER
+
+def cached_roadmap(query, fresh=False):
+    """Return the cached roadmap of a search topic, or generate and cache it.
+
+    `fresh` skips the lookup (the user asked for a new roadmap) but still
+    replaces the cached entry with the new result.
+    """
+    if not fresh:
+        cached = topic_cache.get(query)
+        if cached:
+            return cached
+
+    courses = gen_roadmap(query)
+    if courses:
+        topic_cache.set(query, courses)
+    return courses
+
+def safe_gen_module(module_title, headings):
+    """Return {heading: description} for a module: cached descriptions plus one batched request for the rest.
+
+    Headings missing from the answer are left out; the course engine generates them one by one.
+    Descriptions are cached under the batch prompt's own version.
+    """
+    descriptions = {}
+    missing = []
+    for heading in headings:
+        cached = description_cache.get(heading, MODULE_PROMPT_VERSION)
+        if cached:
+            descriptions[heading] = cached
+        else:
+            missing.append(heading)
 
-def safe_gen_course(heading, retries=MAX_RETRIES):
-    """Try to call gen_course and retry if an error occurs."""
-    for attempt in range(retries):
+    if missing:
         try:
-            # Attempt to generate the course description
-            return gen_course(heading)
+            generated = gen_module_descriptions(module_title, missing)
         except Exception as e:
-            print(f"Error in gen_course for heading '{heading}': {e}")
-            if attempt < retries - 1:
-                print(f"Retrying... (Attempt {attempt + 2} of {retries})")
-            else:
-                print("Max retries reached. Returning empty description.")
-                return "Description not available"
-            
-# Function to load courses from the JSON file with error handling for empty or invalid files
-def load_courses(file_path):
+            print(f"Error in gen_module_descriptions for module '{module_title}': {e}")
+            generated = {}
+        for heading, description in generated.items():
+            description_cache.set(heading, description, MODULE_PROMPT_VERSION)
+        descriptions.update(generated)
+    return descriptions
+
+# Batch function handed to the course engine, or None to generate heading by heading
+course_batch = safe_gen_module if GEN_MODE == 'batched' else None
+
+user_write_locks = KeyedLock()
+
+@contextmanager
+def user_write(user):
+    """Serialize roadmap/course updates of one user within this worker, yielding its current row.
+
+    `user` may be a cached snapshot; writes always go through a freshly loaded row
+    and drop the user from the user cache of every worker.
+    """
+    with user_write_locks.hold(user.email):
+        try:
+            # Another request may have replaced the stored roadmap/course while we waited
+            yield db.session.get(User, user.id, populate_existing=True)
+        finally:
+            user_cache.invalidate(user.email)
+
+def current_user(email):
+    """User record of an authenticated request, from the user cache when it is still valid."""
+    user = user_cache.get(email)
+    if user is None:
+        row = User.query.filter_by(email=email).first()
+        if row:
+            user = user_cache.put(row)
+    return user
+
+def flag(name):
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+def wants_async():
+    """True when the client asked for the work to be queued (?async=1)."""
+    return flag('async')
+
+def job_accepted(job_id):
+    return jsonify({
+        "job_id": job_id,
+        "status": QUEUED,
+        "status_url": url_for('get_job', job_id=job_id)
+    }), 202
+
+def save_roadmap_courses(user, courses):
+    """Append generated courses to the user's roadmap and pre-warm their quizzes."""
     try:
-        with open(file_path, 'r') as json_file:
-            # Attempt to load the JSON data from the file
-            data = json.load(json_file)
-            # If the file is empty, return an empty list
-            if not data:
-                return []
-            return data
-    except FileNotFoundError:
-        # If the file doesn't exist, return an empty list
-        print(f"{file_path} not found. Initializing with empty data.")
-        return []
-    except json.JSONDecodeError:
-        # If the file has invalid JSON, return an empty list
-        print(f"Error decoding JSON in {file_path}. Initializing with empty data.")
-        return []
-    
-# Function to update the JSON file with new courses
-def update_courses_in_file(filename, new_courses):
-    existing_courses = load_courses(filename)
-    # Extend the existing data with new courses
-    existing_courses.extend(new_courses)
-
-    with open(filename, 'w') as json_file:
-        json.dump(existing_courses, json_file, indent=4)
-    
+        # Append the new courses to the user's saved roadmap
+        with user_write(user) as row:
+            course_store.add_courses(row, ROADMAP, courses)
+    except Exception as e:
+        print(f'Error: {e}')
+    finally:
+        roadmap_cache.invalidate(user.email)
+
+    # Generate quizzes for the new courses before the user asks for them
+    quiz_pool.prewarm(course['id'] for course in courses or [])
+
 @app.route('/api/courses/search', methods=['GET'])
 @jwt_required()
 def search_courses():
     email = get_jwt_identity()
     query = request.args.get('query', '').lower()
+    # ?fresh=1 generates a new roadmap instead of reusing one made for the same topic
+    fresh = flag('fresh')
+    try:
+        # ?fields=id,title answers with summaries instead of the full roadmap
+        fields = parse_fields(request.args.get('fields')) if request.args.get('fields') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    filtered_courses = gen_roadmap(query)
-
-    user = User.query.filter_by(email=email).first()
-
-    if not user.roadmap:
-        try:
-            with open(f'{email}_course_roadmap.json', 'w') as f:
-                json.dump(filtered_courses, f)
-        except Exception as e:
-            print(e)
-        try:
-            roadmap_response = cloudinary.uploader.upload(f'{email}_course_roadmap.json', resource_type="raw")
-            roadmap_url = roadmap_response['secure_url']
-            user.roadmap = roadmap_url
-            db.session.commit()
-            os.remove(f'{email}_course_roadmap.json')
-        except Exception as e:
-            print(e)
-
-    else:
-        existing_roadmap={}
-        try:
-            roadmap_url = user.roadmap
+    if wants_async():
+        return job_accepted(job_queue.enqueue('roadmap', {"email": email, "query": query, "fresh": fresh}, owner=email))
 
-            # Download the file content
-            response = requests.get(roadmap_url)
-            if response.status_code == 200:
-                existing_roadmap = response.json()  # Parse the existing roadmap content
-            else:
-                existing_roadmap = []
+    try:
+        filtered_courses = cached_roadmap(query, fresh)
+    except Exception as e:
+        print(f'Error generating roadmap: {e}')
+        return jsonify({"error": "Course generation is temporarily unavailable. Please try again later."}), 503
 
-            # Append new courses to the existing roadmap
-            existing_roadmap.extend(filtered_courses)
+    if not filtered_courses:
+        # The model answered with something that is not a roadmap; nothing is saved
+        return jsonify({"error": "Course generation is temporarily unavailable. Please try again later."}), 503
 
-            print(existing_roadmap)
+    user = current_user(email)
+    save_roadmap_courses(user, filtered_courses)
 
-            cloudinary.uploader.destroy(roadmap_url, resource_type="raw")
+    if fields:
+        return jsonify({"courses": [summarize(course, False, fields) for course in filtered_courses]})
+    return jsonify({"courses": filtered_courses})
 
-            # Create the updated roadmap file
-            update_courses_in_file(f'{email}_course_roadmap.json', existing_roadmap)
-        except Exception as e:
-            print(f'Error: {e}')
+def persist_detailed_course(email, detailed_course):
+    """Save a detailed course outside of the request that generated it."""
+    with app.app_context():
         try:
-            # Upload the updated roadmap to Cloudinary
-            roadmap_response = cloudinary.uploader.upload(f'{email}_course_roadmap.json', resource_type="raw")
-            roadmap_url = roadmap_response['secure_url']
-            user.roadmap = roadmap_url  # Update the URL in the user's record
-            db.session.commit()
-            os.remove(f'{email}_course_roadmap.json')
+            user = current_user(email)
+            with user_write(user) as row:
+                course_store.add_courses(row, COURSE, [detailed_course])
         except Exception as e:
-            print(f'Error: {e}')
-        
-    return jsonify({"courses": filtered_courses})
+            print(f'Error while saving detailed course in background: {e}')
+
+def to_ndjson(event):
+    return json.dumps(event) + "\n"
 
 # Detailed Course
 @app.route('/get_module', methods=['GET'])
@@ -241,125 +395,170 @@ def get_module():
     email = get_jwt_identity()
 
     # Fetch the user
-    user = User.query.filter_by(email=email).first()
+    user = current_user(email)
 
     if not user or not user.roadmap:
         return jsonify({"error": "User or roadmap not found."}), 404
 
-    # Check if the detailed course is already generated
-    if user.course:
-        response = requests.get(user.course)
-        if response.status_code == 200:
-            existing_course = response.json()  # Parse the existing roadmap content
-        else:
-            existing_course = []
-        
-        course = next((c for c in existing_course if c['id'].lower() == course_id.lower()), None)
-
+    try:
+        # Check if the detailed course is already generated
+        course = course_store.get_course(user, COURSE, course_id)
         if course:
-            return jsonify(course)
-        
-         # Download the roadmap content
-        response = requests.get(user.roadmap)
-        if response.status_code == 200:
-            existing_roadmap = response.json()  # Parse the roadmap content
-        else:
-            return jsonify({"error": "Failed to fetch roadmap content."}), response.status_code
-        
-        course = next((c for c in existing_roadmap if c['id'].lower() == course_id.lower()), None)
-        if not course:
-            print("Not course")
-            return jsonify({"error": "Course not found."}), 404
-        
-        # Prepare the detailed course
-        detailed_course = {
-            "title": course["title"],
-            "id": course["id"],
-            "modules": []
-        }
+            return json_response(course)
 
-        for module in course['modules']:
-            module_content = {
-                "moduleTitle": module["moduleTitle"],
-                "headings": []
-            }
+        course = course_store.get_course(user, ROADMAP, course_id)
+    except StoreError as e:
+        return jsonify({"error": str(e)}), 502
 
-            for heading in module['headings']:
-                module_content['headings'].append({
-                    "heading": heading,
-                    "description": safe_gen_course(heading, retries=MAX_RETRIES)
-                })
+    if not course:
+        print("Not course")
+        return jsonify({"error": "Course not found."}), 404
 
-            detailed_course["modules"].append(module_content)
+    if wants_async():
+        return job_accepted(job_queue.enqueue('course', {"email": email, "course_id": course_id}, owner=email))
 
-        existing_course.extend([detailed_course])
+    # Prepare the detailed course, generating all headings concurrently
+    detailed_course = build_detailed_course(course, safe_gen_course, generate_batch=course_batch)
 
-        cloudinary.uploader.destroy(user.course, resource_type="raw")
+    # Do not save a course made only of placeholders (e.g. while Gemini is down)
+    if not has_descriptions(detailed_course):
+        return jsonify({"error": "Course generation is temporarily unavailable. Please try again later."}), 503
 
-        update_courses_in_file(f'{email}_detailed_course.json', existing_course)
+    try:
+        with user_write(user) as row:
+            course_store.add_courses(row, COURSE, [detailed_course])
+        return json_response(detailed_course)
+    except Exception as e:
+        print(f'Error: {e}')
+        return jsonify({"error": "Failed to upload the detailed course."}), 500
 
-        try:
-            # Upload the updated roadmap to Cloudinary
-            course_response = cloudinary.uploader.upload(f'{email}_detailed_course.json', resource_type="raw")
-            course_url = course_response['secure_url']
-            user.course = course_url  # Update the URL in the user's record
-            db.session.commit()
-            os.remove(f'{email}_detailed_course.json')
-            return jsonify(detailed_course), 200
-        except Exception as e:
-            print(f'Error: {e}')
-            return jsonify({"error": "Failed to upload the detailed course."}), 500
-      
-    # Download the roadmap content
-    response = requests.get(user.roadmap)
-    if response.status_code == 200:
-        existing_roadmap = response.json()  # Parse the roadmap content
+# Detailed Course, streamed as newline delimited JSON while headings are generated
+@app.route('/get_module/stream', methods=['GET'])
+@jwt_required()
+def stream_module():
+    course_id = request.args.get('course-id')
+    email = get_jwt_identity()
+
+    user = current_user(email)
+
+    if not user or not user.roadmap:
+        return jsonify({"error": "User or roadmap not found."}), 404
+
+    try:
+        detailed_course = course_store.get_course(user, COURSE, course_id)
+        course = None if detailed_course else course_store.get_course(user, ROADMAP, course_id)
+    except StoreError as e:
+        return jsonify({"error": str(e)}), 502
+
+    if detailed_course:
+        def generate():
+            yield to_ndjson({"type": "skeleton", "course": detailed_course})
+            yield to_ndjson({"type": "done", "course": detailed_course})
+    elif course:
+        def generate():
+            # Send the structure right away, then every description as soon as it is ready
+            skeleton = course_skeleton(course)
+            yield to_ndjson({"type": "skeleton", "course": skeleton})
+
+            for m, h, description in iter_descriptions(course, safe_gen_course, generate_batch=course_batch):
+                skeleton["modules"][m]["headings"][h]["description"] = description
+                yield to_ndjson({"type": "heading", "module": m, "heading": h, "description": description})
+
+            if has_descriptions(skeleton):
+                threading.Thread(target=persist_detailed_course, args=(email, skeleton)).start()
+            yield to_ndjson({"type": "done", "course": skeleton})
     else:
-        return jsonify({"error": "Failed to fetch roadmap content."}), response.status_code
-    
-    course = next((c for c in existing_roadmap if c['id'].lower() == course_id.lower()), None)
-    if not course:
-        print("Not course")
         return jsonify({"error": "Course not found."}), 404
-    
-    # Prepare the detailed course
-    detailed_course = {
-        "title": course["title"],
-        "id": course["id"],
-        "modules": []
-    }
 
-    for module in course['modules']:
-        module_content = {
-            "moduleTitle": module["moduleTitle"],
-            "headings": []
-        }
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
-        for heading in module['headings']:
-            module_content['headings'].append({
-                "heading": heading,
-                "description": safe_gen_course(heading, retries=MAX_RETRIES)
-            })
+def run_roadmap_job(payload, progress):
+    with app.app_context():
+        courses = cached_roadmap(payload['query'], payload.get('fresh', False))
+        if not courses:
+            raise RuntimeError("Course generation is temporarily unavailable.")
+        progress(0.5)
+        user = current_user(payload['email'])
+        save_roadmap_courses(user, courses)
+        return {"courses": courses}
+
+def run_course_job(payload, progress):
+    with app.app_context():
+        user = current_user(payload['email'])
+        detailed_course = course_store.get_course(user, COURSE, payload['course_id'])
+        if detailed_course:
+            return detailed_course
+
+        course = course_store.get_course(user, ROADMAP, payload['course_id'])
+        if not course:
+            raise ValueError("Course not found.")
+
+        detailed_course = course_skeleton(course)
+        total = sum(len(module['headings']) for module in course['modules']) or 1
+        for done, (m, h, description) in enumerate(iter_descriptions(course, safe_gen_course, generate_batch=course_batch), 1):
+            detailed_course["modules"][m]["headings"][h]["description"] = description
+            progress(done / total)
 
-        detailed_course["modules"].append(module_content)
+        if not has_descriptions(detailed_course):
+            raise RuntimeError("Course generation is temporarily unavailable.")
 
-    with open(f'{email}_detailed_course.json', 'w') as f:
-        json.dump([detailed_course], f)
+        with user_write(user) as row:
+            course_store.add_courses(row, COURSE, [detailed_course])
+        return detailed_course
 
-    # Upload the detailed course to Cloudinary
+job_queue.register('roadmap', run_roadmap_job)
+job_queue.register('course', run_course_job)
+
+@app.before_first_request
+def create_missing_tables():
+    # Tables added after the database was set up (such as course_change) are created
+    # on first use; create_all leaves existing tables and their data untouched
     try:
-        detailed_response = cloudinary.uploader.upload(
-            f'{email}_detailed_course.json', 
-            resource_type="raw"
-        )
-        detailed_url = detailed_response['secure_url']
-        user.course = detailed_url
-        db.session.commit()
-        os.remove(f'{email}_detailed_course.json')
-        return jsonify(detailed_course), 200
+        db.create_all()
     except Exception as e:
-        print(e)
-        return jsonify({"error": "Failed to upload the detailed course."}), 500
+        # Another worker may have created the same table a moment earlier
+        db.session.rollback()
+        print(f"Failed to create missing tables: {e}")
+
+@app.before_first_request
+def start_job_workers():
+    # Resume jobs left queued or running by a previous process
+    job_queue.start()
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    job = job_queue.get(job_id)
+
+    if not job or job.pop('owner') != get_jwt_identity():
+        return jsonify({"error": "Job not found."}), 404
+
+    return jsonify(job), 200
+
+@app.route('/api/llm/stats', methods=['GET'])
+def llm_stats():
+    # Rate limiter queue depth and wait times, plus the state of the Gemini circuit breaker
+    stats = gateway.metrics()
+    stats["circuit"] = gemini_breaker.state
+    return jsonify(stats), 200
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    # Prometheus text format: request and dependency latency histograms, token and retry counters, cache stats
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+def chat_session(session_id):
+    """History of the given conversation, or a new empty one when it is missing or expired."""
+    history = chat_sessions.history(session_id) if session_id else None
+    if history is None:
+        return chat_sessions.create(), []
+    return session_id, history
 
 @app.route('/chat', methods=['POST'])
 # @jwt_required()
@@ -370,11 +569,60 @@ def chat():
     if not user_message:
         return jsonify({'error': 'No message provided'}), 400
     
+    # The conversation so far is kept server side; clients only send its session id
+    session_id, history = chat_session(request.json.get('session_id'))
+
     # Generate bot response based on user input
-    bot_response = generate_bot_response(user_message)
+    bot_response = generate_bot_response(user_message, history)
+    if bot_response != FALLBACK_RESPONSE:
+        chat_sessions.add_exchange(session_id, user_message, bot_response)
     
     # Return the response as JSON
-    return jsonify({'response': bot_response})
+    return jsonify({'response': bot_response, 'session_id': session_id})
+
+@app.route('/chat/<session_id>', methods=['DELETE'])
+def end_chat(session_id):
+    chat_sessions.end(session_id)
+    return jsonify({"message": "Chat session ended."}), 200
+
+def to_sse(data, event=None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+@app.route('/chat/stream', methods=['POST'])
+# @jwt_required()
+def chat_stream():
+    user_message = request.json.get('message')
+
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+
+    session_id, history = chat_session(request.json.get('session_id'))
+
+    def generate():
+        # When the client goes away the server closes this generator, which
+        # closes stream_bot_response and cancels the model stream
+        yield to_sse({'session_id': session_id}, event='session')
+        chunks = stream_bot_response(user_message, history)
+        texts = []
+        try:
+            for text in chunks:
+                texts.append(text)
+                yield to_sse({'text': text})
+            # Only complete answers become part of the conversation
+            chat_sessions.add_exchange(session_id, user_message, ''.join(texts))
+            yield to_sse({}, event='done')
+        except Exception as e:
+            print(f"Error while streaming bot response: {e}")
+            yield to_sse({'error': 'Failed to generate a response.'}, event='error')
+        finally:
+            chunks.close()
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/api/courses', methods=['GET'])
 @jwt_required()
@@ -385,28 +633,26 @@ def get_courses():
         email = get_jwt_identity()
 
         # Fetch the user from the database
-        user = User.query.filter_by(email=email).first()
+        user = current_user(email)
 
         if not user:
             return jsonify({"error": "User not found. Please check your credentials."}), 404
 
         if not user.roadmap:
             return jsonify({"email": email, "courses": None}), 200
-        # Fetch the roadmap content from Cloudinary
-        roadmap_url = user.roadmap
-        response = requests.get(roadmap_url)
 
-        if response.status_code != 200:
-            return jsonify({"error": "Failed to fetch roadmap from Cloudinary. Please try again later."}), response.status_code
+        # Serve the roadmap from the cache, loading it from the store on a miss
+        entry = roadmap_cache.load(user, lambda: course_store.list_courses(user, ROADMAP))
 
-        # Parse the JSON content from the roadmap file
-        try:
-            courses_data = response.json()  # Assuming Cloudinary contains valid JSON content
-        except ValueError:
-            return jsonify({"error": "Invalid roadmap format. Unable to parse the data."}), 500
+        # Answer 304 Not Modified when the client already has this version
+        response = Response(entry.body, mimetype='application/json')
+        response.set_etag(entry.etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
 
-        # Return the parsed courses data
-        return jsonify({"email": email, "courses": courses_data}), 200
+    except StoreError as e:
+        print(f"Store error while fetching roadmap: {e}")
+        return jsonify({"error": "An error occurred while fetching the roadmap. Please try again later."}), 500
 
     except requests.RequestException as e:
         print(f"Request error while fetching roadmap: {e}")
@@ -416,6 +662,51 @@ def get_courses():
         print(f"Unexpected error: {e}")
         return jsonify({"error": "An unexpected error occurred. Please try again later."}), 500
 
+# Summary listing of the roadmap: ids, titles and descriptions, one page at a time
+# (?fields=id,title,detailed also tells which courses have their detailed course)
+@app.route('/api/courses/summary', methods=['GET'])
+@jwt_required()
+def list_course_summaries():
+    email = get_jwt_identity()
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', COURSE_PAGE_SIZE, type=int), 1), MAX_COURSE_PAGE_SIZE)
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    user = current_user(email)
+    if not user:
+        return jsonify({"error": "User not found. Please check your credentials."}), 404
+    if not user.roadmap:
+        return jsonify({"courses": [], "total": 0, "offset": offset, "limit": limit, "next_offset": None}), 200
+
+    try:
+        courses, total = course_store.list_summaries(user, offset, limit, fields)
+    except StoreError as e:
+        print(f"Store error while listing courses: {e}")
+        return jsonify({"error": "An error occurred while fetching the roadmap. Please try again later."}), 500
+
+    next_offset = offset + limit if offset + limit < total else None
+    return jsonify({"courses": courses, "total": total, "offset": offset, "limit": limit, "next_offset": next_offset}), 200
+
+# One roadmap entry by id
+@app.route('/api/courses/<course_id>', methods=['GET'])
+@jwt_required()
+def get_roadmap_course(course_id):
+    user = current_user(get_jwt_identity())
+    if not user or not user.roadmap:
+        return jsonify({"error": "User or roadmap not found."}), 404
+
+    try:
+        course = course_store.get_course(user, ROADMAP, course_id)
+    except StoreError as e:
+        return jsonify({"error": str(e)}), 502
+
+    if not course:
+        return jsonify({"error": "Course not found."}), 404
+    return json_response(course)
+
 # Remove courses
 @app.route('/api/remove_course', methods=['POST'])
 @jwt_required()
@@ -423,7 +714,7 @@ def remove_course():
     try:
         email = get_jwt_identity()
 
-        user = User.query.filter_by(email=email).first()
+        user = current_user(email)
 
         if not user:
             return jsonify({"error": "User not found. Please check your credentials."}), 404
@@ -431,95 +722,22 @@ def remove_course():
         if not user.roadmap:
             return jsonify({"error": "No roadmap found for this user."}), 400
 
-        roadmap_url = user.roadmap
-        course_url = user.course
-        if user.course:
-            response = requests.get(roadmap_url)
-
-            response2 = requests.get(course_url)
-
-            if response.status_code != 200 or response2.status_code != 200:
-                return jsonify({"error": "Failed to fetch roadmap from Cloudinary. Please try again later."}), response.status_code
-
-            try:
-                roadmap_data = response.json()
-            except ValueError:
-                return jsonify({"error": "Invalid roadmap format. Unable to parse the data."}), 500
-        
-            try:
-                course_data = response2.json()
-            except ValueError:
-                return jsonify({"error": "Invalid course format. Unable to parse the data."}), 500
-
-            course_to_remove = request.json.get('course_title')
-            if not course_to_remove:
-                return jsonify({"error": "Course title is required to remove a course."}), 400
-
-            updated_courses = [course for course in roadmap_data if course['title'] != course_to_remove]
-
-            updated_detailed_courses = [course for course in course_data if course['title'] != course_to_remove]
-
-            if not updated_courses:
-                user.roadmap = None
-                db.session.commit()
-
-                cloudinary.uploader.destroy(roadmap_url, resource_type="raw")
-        
-            if not updated_detailed_courses:
-                user.course = None
-                db.session.commit()
-
-                cloudinary.uploader.destroy(course_url, resource_type="raw")
-
-            if updated_courses:
-                try:
-                    temp_filename = f"{email}_updated_course_roadmap.json"
-                    with open(temp_filename, 'w') as temp_file:
-                        json.dump(updated_courses, temp_file)
-
-                    upload_response = cloudinary.uploader.upload(
-                        temp_filename, 
-                        resource_type="raw"
-                    )
-                    updated_roadmap_url = upload_response.get('secure_url')
-
-                    if not updated_roadmap_url:
-                        return jsonify({"error": "Failed to upload updated roadmap to Cloudinary."}), 500
-
-                    user.roadmap = updated_roadmap_url
-                    db.session.commit()
-
-                    os.remove(temp_filename)
-                except Exception as e:
-                    print(f"Error while uploading updated roadmap: {e}")
-                    return jsonify({"error": "Failed to update roadmap. Please try again later."}), 500
-            
-            if updated_detailed_courses:
-                try:
-                    temp_filename = f"{email}_updated_detailed_course.json"
-                    with open(temp_filename, 'w') as temp_file:
-                        json.dump(updated_detailed_courses, temp_file)
-
-                    upload_response = cloudinary.uploader.upload(
-                        temp_filename, 
-                        resource_type="raw"
-                    )
-                    updated_roadmap_url = upload_response.get('secure_url')
-
-                    if not updated_roadmap_url:
-                        return jsonify({"error": "Failed to upload updated roadmap to Cloudinary."}), 500
-
-                    user.course = updated_roadmap_url
-                    db.session.commit()
-
-                    os.remove(temp_filename)
-                except Exception as e:
-                    print(f"Error while uploading updated roadmap: {e}")
-                    return jsonify({"error": "Failed to update roadmap. Please try again later."}), 500
+        course_to_remove = request.json.get('course_title')
+        if not course_to_remove:
+            return jsonify({"error": "Course title is required to remove a course."}), 400
 
+        try:
+            with user_write(user) as row:
+                updated_courses = course_store.remove_course(row, course_to_remove)
+        finally:
+            roadmap_cache.invalidate(email)
 
         return jsonify({"message": "Course removed successfully.", "updated_courses": updated_courses}), 200
 
+    except StoreError as e:
+        print(f"Store error while removing course: {e}")
+        return jsonify({"error": "Failed to update roadmap. Please try again later."}), 500
+
     except requests.RequestException as e:
         print(f"Request error while fetching roadmap: {e}")
         return jsonify({"error": "An error occurred while fetching the roadmap. Please try again later."}), 500
@@ -533,9 +751,21 @@ def get_quiz():
     # Get the 'topic' query parameter
     topic = request.args.get('topic')
 
-    quiz_data = generate_quiz(topic)
-    # print(quiz_data)
-    
+    if not topic:
+        return jsonify({'error': 'No topic provided'}), 400
+
+    # Logged in users get questions they have not been served yet
+    try:
+        verify_jwt_in_request(optional=True)
+        email = get_jwt_identity()
+    except Exception:
+        email = None
+
+    quiz_data = quiz_pool.get_quiz(topic, user=email)
+    if quiz_data is None:
+        # Nothing in the pool for this topic and generating a quiz failed
+        return jsonify({"error": "Quiz generation is temporarily unavailable. Please try again later."}), 503
+
     return jsonify(quiz_data)
 
 if __name__ == '__main__':
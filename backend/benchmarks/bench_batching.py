@@ -0,0 +1,66 @@
+"""Benchmark: one request per heading vs one batched request per module.
+
+Drives courseEngine with the real gen_course / gen_module_descriptions on top
+of a local FakeModel, and reports model calls, wall time and token usage.
+A batched answer longer than --max-output-tokens is truncated and its module
+falls back to one call per heading, as with the real model.
+
+Run from the backend directory:
+    python benchmarks/bench_batching.py [--overhead 0.3] [--concurrency 8] [--description-tokens 1500]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep the gateway's rate limiter out of the measurement
+os.environ.setdefault('GEMINI_RPM', '100000')
+os.environ.setdefault('GEMINI_TPM', '100000000')
+os.environ.setdefault('GEMINI_RATE_DB', '')
+
+from courseEngine import build_detailed_course  # noqa: E402
+from courseGenerator import gen_course, gen_module_descriptions  # noqa: E402
+from modelGateway import gateway  # noqa: E402
+from benchmarks.fakes import FakeModel  # noqa: E402
+
+ROADMAP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'roadmap.json')
+
+
+def run(course, batched, args):
+    model = FakeModel(args.overhead, args.tokens_per_second, args.description_tokens, args.max_output_tokens)
+    gateway.model = model
+    start = time.perf_counter()
+    detailed = build_detailed_course(
+        course, gen_course, concurrency=args.concurrency,
+        generate_batch=gen_module_descriptions if batched else None
+    )
+    elapsed = time.perf_counter() - start
+    missing = sum(1 for m in detailed['modules'] for h in m['headings'] if not h['description'].startswith('Detailed'))
+    return model, elapsed, missing
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--overhead', type=float, default=0.3, help='fixed seconds per model call')
+    parser.add_argument('--tokens-per-second', type=float, default=4000)
+    parser.add_argument('--description-tokens', type=int, default=400)
+    parser.add_argument('--max-output-tokens', type=int, default=8192, help='output limit of one model call')
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    with open(ROADMAP_FILE) as f:
+        course = json.load(f)[0]
+    headings = sum(len(m['headings']) for m in course['modules'])
+    print(f"course '{course['id']}': {len(course['modules'])} modules, {headings} headings, "
+          f"concurrency {args.concurrency}, call overhead {args.overhead}s")
+    print(f"{'mode':>12} {'calls':>6} {'wall s':>8} {'prompt tok':>11} {'output tok':>11} {'missing':>8}")
+    for batched in (False, True):
+        model, elapsed, missing = run(course, batched, args)
+        print(f"{'batched' if batched else 'per-heading':>12} {model.calls:>6} {elapsed:>8.2f} "
+              f"{model.prompt_tokens:>11} {model.output_tokens:>11} {missing:>8}")
+
+
+if __name__ == '__main__':
+    main()
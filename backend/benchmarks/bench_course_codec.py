@@ -0,0 +1,113 @@
+"""Benchmark: stored and transferred size, and parse time, of detailed courses.
+
+Compares the previous format (pretty-printed JSON stored, plain JSON sent)
+with courseCodec (compact gzip JSON stored, gzip sent to clients that accept
+it) on a user's detailed courses built from roadmap.json with long-form
+generated-looking descriptions.
+
+Run from the backend directory:
+    python benchmarks/bench_course_codec.py [--courses 5] [--words 350]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import courseCodec  # noqa: E402
+from courseCodec import encode, decode, dumps, COMPRESS_LEVEL  # noqa: E402
+
+ROADMAP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'roadmap.json')
+
+VOCABULARY = (
+    "the a an of to in and or for with by on is are can be this that these it its as you your we "
+    "example code function variable class object method value type data structure program compile run "
+    "memory performance error exception handle define call return loop condition array list string "
+    "understand learn concept important common use useful practice approach pattern design principle "
+    "first next then finally however therefore because when while each every many most simple complex"
+).split()
+
+
+def description(rng, heading, words):
+    """Markdown-ish long-form text mentioning the heading, like a generated description."""
+    sentences = []
+    count = 0
+    while count < words:
+        length = rng.randint(8, 22)
+        sentence = [rng.choice(VOCABULARY) for _ in range(length)]
+        if rng.random() < 0.3:
+            sentence.insert(rng.randint(0, length), heading)
+        sentences.append(' '.join(sentence).capitalize() + '.')
+        count += length
+    paragraphs = [' '.join(sentences[i:i + 4]) for i in range(0, len(sentences), 4)]
+    return f"## {heading}\n\n" + '\n\n'.join(paragraphs) + "\n\n```\n// example of " + heading + "\n```"
+
+
+def detailed_courses(count, words, seed=1):
+    rng = random.Random(seed)
+    with open(ROADMAP_FILE) as f:
+        template = json.load(f)[0]
+    courses = []
+    for i in range(count):
+        courses.append({
+            "id": f"{template['id']}-{i}",
+            "title": f"{template['title']} {i}",
+            "modules": [
+                {"moduleTitle": m['moduleTitle'], "headings": [
+                    {"heading": h, "description": description(rng, h, words)} for h in m['headings']
+                ]}
+                for m in template['modules']
+            ],
+        })
+    return courses
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--courses', type=int, default=5, help='detailed courses stored for the user')
+    parser.add_argument('--words', type=int, default=350, help='words per heading description')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    courses = detailed_courses(args.courses, args.words)
+    one_course = courses[0]
+
+    # Before: update_courses_in_file wrote indent=4 JSON, /get_module sent jsonify output
+    old_stored = json.dumps(courses, indent=4).encode('utf-8')
+    old_sent = json.dumps(one_course).encode('utf-8')
+    # After: courseCodec at rest, gzip on the wire
+    new_stored = encode(courses)
+    new_sent = gzip.compress(dumps(one_course), compresslevel=COMPRESS_LEVEL)
+
+    rows = [
+        ('stored bytes (all courses)', len(old_stored), len(new_stored)),
+        ('sent bytes (/get_module)', len(old_sent), len(new_sent)),
+        ('parse stored ms', best_of(lambda: json.loads(old_stored), args.repeat),
+         best_of(lambda: decode(new_stored), args.repeat)),
+        ('write stored ms', best_of(lambda: json.dumps(courses, indent=4).encode('utf-8'), args.repeat),
+         best_of(lambda: encode(courses), args.repeat)),
+    ]
+
+    headings = sum(len(m['headings']) for m in one_course['modules'])
+    print(f"{args.courses} detailed courses x {headings} headings x ~{args.words} words, "
+          f"gzip level {COMPRESS_LEVEL}, orjson {'on' if courseCodec.orjson else 'off'}")
+    print(f"{'':>28} {'before':>12} {'after':>12} {'ratio':>7}")
+    for name, before, after in rows:
+        print(f"{name:>28} {before:>12.1f} {after:>12.1f} {before / after:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark for courseEngine: sequential vs concurrent heading generation.
+
+Uses a fake gen_course with a fixed latency, so generation of a course with
+N headings should take about N * latency sequentially and about
+ceil(N / concurrency) * latency with the engine.
+
+Run from the backend directory:
+    python benchmarks/bench_course_engine.py [--latency 0.2]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from courseEngine import build_detailed_course  # noqa: E402
+from benchmarks.fakes import FakeGenCourse  # noqa: E402
+
+ROADMAP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'roadmap.json')
+
+
+def sequential_build(course, generate):
+    """The original get_module loop: one heading at a time."""
+    return {
+        "title": course["title"],
+        "id": course["id"],
+        "modules": [
+            {
+                "moduleTitle": module["moduleTitle"],
+                "headings": [{"heading": h, "description": generate(h)} for h in module["headings"]]
+            }
+            for module in course["modules"]
+        ]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.2, help='fake gen_course latency in seconds')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 5, 10, 25])
+    args = parser.parse_args()
+
+    with open(ROADMAP_FILE) as f:
+        course = json.load(f)[0]
+    headings = sum(len(m['headings']) for m in course['modules'])
+    print(f"course '{course['id']}': {headings} headings, fake latency {args.latency}s")
+
+    fake = FakeGenCourse(args.latency)
+    start = time.perf_counter()
+    expected = sequential_build(course, fake)
+    print(f"{'sequential':>14}: {time.perf_counter() - start:6.2f}s  (ideal {headings * args.latency:.2f}s)")
+
+    for concurrency in args.concurrency:
+        fake = FakeGenCourse(args.latency)
+        start = time.perf_counter()
+        detailed = build_detailed_course(course, fake, concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        ideal = math.ceil(headings / concurrency) * args.latency
+        assert detailed == expected, "heading order differs from sequential output"
+        print(f"{'concurrency ' + str(concurrency):>14}: {elapsed:6.2f}s  (ideal {ideal:.2f}s, {fake.calls} calls)")
+
+
+if __name__ == '__main__':
+    main()
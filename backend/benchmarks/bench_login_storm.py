@@ -0,0 +1,115 @@
+"""Benchmark: /api/courses latency while a storm of logins is running.
+
+Starts the Flask app on a local gevent WSGI server backed by SQLite and the
+local course store, then keeps `--storm` greenlets logging in while one
+client measures GET /api/courses. Runs once with bcrypt hashed inline on the
+event loop and once on the password thread pool, and prints p50/p95/p99.
+
+Run from the backend directory:
+    python benchmarks/bench_login_storm.py [--storm 20] [--seconds 5] [--rounds 12]
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+
+import gevent  # noqa: E402
+import requests  # noqa: E402
+from gevent.pywsgi import WSGIServer  # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--storm', type=int, default=20, help='concurrent clients logging in')
+parser.add_argument('--seconds', type=float, default=5, help='duration of each run')
+parser.add_argument('--rounds', type=int, default=12, help='bcrypt cost factor')
+parser.add_argument('--pool-size', type=int, default=4, help='password thread pool size')
+args = parser.parse_args()
+
+workdir = tempfile.mkdtemp(prefix='bench_login_')
+os.environ.update({
+    'AIVEN_URL': f"sqlite:///{os.path.join(workdir, 'app.db')}",
+    'JWT_SECRET_KEY': 'benchmark-secret-key-benchmark-secret-key',
+    'GEMINI_API': 'unused',
+    'COURSE_STORE': 'local',
+    'COURSE_STORE_DIR': os.path.join(workdir, 'courses'),
+    'DESCRIPTION_CACHE_DB': os.path.join(workdir, 'descriptions.db'),
+    'QUIZ_POOL_DB': os.path.join(workdir, 'quiz.db'),
+    'JOB_DB': os.path.join(workdir, 'jobs.db'),
+    'BCRYPT_LOG_ROUNDS': str(args.rounds),
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as backend  # noqa: E402
+from passwordHasher import PasswordHasher  # noqa: E402
+
+ROADMAP = [{
+    "id": f"course-{i}",
+    "title": f"Course {i}",
+    "description": "Benchmark course",
+    "modules": [{"moduleTitle": "Module", "headings": ["Heading 1", "Heading 2"]}],
+} for i in range(5)]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else float('nan')
+
+
+def setup(base):
+    requests.post(f'{base}/register', json={'name': 'bench', 'email': 'bench@example.com', 'password': 'secret'})
+    token = requests.post(f'{base}/login', json={'email': 'bench@example.com', 'password': 'secret'}).json()['access_token']
+    with backend.app.app_context():
+        user = backend.User.query.filter_by(email='bench@example.com').first()
+        backend.course_store.add_courses(user, backend.ROADMAP, ROADMAP)
+    return {'Authorization': f'Bearer {token}'}
+
+
+def run(base, headers, pool_size):
+    backend.password_hasher = PasswordHasher(backend.bcrypt, pool_size)
+    stop_at = time.perf_counter() + args.seconds
+    logins = []
+
+    def storm():
+        session = requests.Session()
+        while time.perf_counter() < stop_at:
+            session.post(f'{base}/login', json={'email': 'bench@example.com', 'password': 'secret'})
+            logins.append(1)
+
+    def measure():
+        session = requests.Session()
+        latencies = []
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            session.get(f'{base}/api/courses', headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            gevent.sleep(0.01)
+        return latencies
+
+    stormers = [gevent.spawn(storm) for _ in range(args.storm)]
+    latencies = gevent.spawn(measure).get()
+    gevent.joinall(stormers)
+    label = f'thread pool ({pool_size})' if pool_size else 'inline'
+    print(f"{label:>16}: {len(latencies):5d} requests  p50 {percentile(latencies, 50):7.1f} ms  "
+          f"p95 {percentile(latencies, 95):7.1f} ms  p99 {percentile(latencies, 99):7.1f} ms  "
+          f"({len(logins)} logins)")
+
+
+def main():
+    with backend.app.app_context():
+        backend.db.create_all()
+    server = WSGIServer(('127.0.0.1', 0), backend.app, log=None)
+    server.start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    headers = setup(base)
+
+    print(f"/api/courses latency during a {args.storm}-client login storm, bcrypt cost {args.rounds}")
+    run(base, headers, 0)
+    run(base, headers, args.pool_size)
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
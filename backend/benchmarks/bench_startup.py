@@ -0,0 +1,97 @@
+"""Benchmark: worker startup with lazy vs preloaded Gemini and Cloudinary clients.
+
+Each run starts a fresh interpreter that imports app (as a gunicorn worker
+does) and then answers GET /api and a first POST /chat through the Flask test
+client. The Gemini SDK is really imported and configured, but its model is a
+FakeGemini so no network is needed. Prints the median of `--runs` runs for:
+import time, time to the first /api response and to the first /chat response,
+all measured from interpreter start.
+
+Run from the backend directory:
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import time
+started = time.perf_counter()
+import json, os, sys
+sys.path.insert(0, os.environ['BACKEND_DIR'])
+
+import app as backend
+imported = time.perf_counter()
+
+from clients import clients, _genai
+from benchmarks.fakes import FakeGemini
+
+
+def fake_genai():
+    # Import and configure the real SDK, but hand out a model that needs no network
+    genai = _genai()
+
+    class Shim:
+        GenerativeModel = staticmethod(lambda name: FakeGemini(overhead=0, tokens_per_second=1e9))
+    return Shim
+
+
+clients.register('genai', fake_genai)
+if 'genai' in clients.instances:
+    clients.instances['genai'] = fake_genai()
+    backend.gateway.model = None
+
+client = backend.app.test_client()
+client.get('/api')
+first_api = time.perf_counter()
+client.post('/chat', json={'message': 'hello'})
+first_chat = time.perf_counter()
+
+print(json.dumps({
+    'import': imported - started,
+    'first_api': first_api - started,
+    'first_chat': first_chat - started,
+}))
+'''
+
+
+def run_child(preload, workdir):
+    env = dict(os.environ, BACKEND_DIR=BACKEND_DIR, PRELOAD_CLIENTS='all' if preload else '',
+               AIVEN_URL=f"sqlite:///{os.path.join(workdir, 'app.db')}",
+               JWT_SECRET_KEY='startup-benchmark-secret-key-startup-benchmark',
+               GEMINI_API='unused', COURSE_STORE='local',
+               COURSE_STORE_DIR=os.path.join(workdir, 'courses'),
+               DESCRIPTION_CACHE_DB=os.path.join(workdir, 'descriptions.db'),
+               TOPIC_CACHE_DB=os.path.join(workdir, 'topics.db'),
+               QUIZ_POOL_DB=os.path.join(workdir, 'quiz.db'),
+               JOB_DB=os.path.join(workdir, 'jobs.db'),
+               CHAT_SESSION_DB=os.path.join(workdir, 'chat_sessions.db'),
+               GEMINI_RATE_DB=os.path.join(workdir, 'gemini_rate.db'))
+    output = subprocess.run([sys.executable, '-c', CHILD], env=env, cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    print(f"median of {args.runs} fresh interpreters, seconds from interpreter start")
+    print(f"{'mode':>10} {'import':>8} {'1st /api':>9} {'1st /chat':>10}")
+    for preload in (False, True):
+        runs = [run_child(preload, workdir) for _ in range(args.runs)]
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(f"{'preload' if preload else 'lazy':>10} {median['import']:>8.3f} "
+              f"{median['first_api']:>9.3f} {median['first_chat']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
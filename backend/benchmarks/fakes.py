@@ -0,0 +1,222 @@
+"""Local stand-ins for the external services used by the backend, for benchmarks."""
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from google.api_core import exceptions as google_exceptions
+
+
+class FakeGenCourse:
+    """Stand-in for courseGenerator.gen_course that sleeps for a fixed latency."""
+
+    def __init__(self, latency=0.2):
+        self.latency = latency
+        self.calls = 0
+
+    def __call__(self, heading):
+        self.calls += 1
+        time.sleep(self.latency)
+        return f"Detailed description of {heading}."
+
+
+class FakeResponse:
+    def __init__(self, text, prompt_tokens, output_tokens):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens,
+        )
+
+
+class FakeModel:
+    """Stand-in for genai.GenerativeModel answering the course generation prompts.
+
+    Each call takes `overhead` seconds plus the time to produce its output at
+    `tokens_per_second`, so a call that writes several descriptions is slower
+    than one that writes a single description but cheaper than several calls.
+    Batched prompts (those listing "Headings: [...]") get a JSON object back.
+    Like the real model, an answer longer than `max_output_tokens` is cut off,
+    which leaves a batched answer as invalid JSON.
+    """
+
+    def __init__(self, overhead=0.3, tokens_per_second=4000, description_tokens=400, max_output_tokens=None):
+        self.overhead = overhead
+        self.tokens_per_second = tokens_per_second
+        self.description_tokens = description_tokens
+        self.max_output_tokens = max_output_tokens
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        match = re.search(r'Headings: (\[.*\])', prompt)
+        if match:
+            headings = json.loads(match.group(1))
+            text = json.dumps({h: self._description(h) for h in headings})
+        else:
+            headings = [prompt]
+            text = self._description(prompt)
+
+        prompt_tokens = len(prompt) // 4 + 1
+        output_tokens = self.description_tokens * len(headings)
+        if self.max_output_tokens and output_tokens > self.max_output_tokens:
+            text = text[:len(text) * self.max_output_tokens // output_tokens]
+            output_tokens = self.max_output_tokens
+        with self.lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+        time.sleep(self.overhead + output_tokens / self.tokens_per_second)
+        return FakeResponse(text, prompt_tokens, output_tokens)
+
+    def _description(self, heading):
+        return f"Detailed description of {heading}."
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGemini(FakeModel):
+    """FakeModel that also answers roadmap, quiz and chat prompts, and fails at a given rate.
+
+    Latencies vary by +/- `jitter` (a fraction) around the modelled time. A
+    failing call waits like a real one and raises ServiceUnavailable, which
+    the resilience layer treats as retryable.
+    """
+
+    def __init__(self, overhead=0.3, tokens_per_second=4000, description_tokens=400,
+                 failure_rate=0.0, jitter=0.5, seed=None):
+        super().__init__(overhead, tokens_per_second, description_tokens)
+        self.failure_rate = failure_rate
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.failures = 0
+        self.question_ids = itertools.count()
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        context = 0
+        if not isinstance(prompt, str):
+            # Multi-turn chat contents: the earlier turns are sent too, the reply answers the last one
+            turns = [' '.join(content['parts']) for content in prompt]
+            prompt, context = turns[-1], sum(len(turn) for turn in turns[:-1])
+        roadmap = re.search(r'Generate a full course roadmap for the (.*?)\. Provide', prompt)
+        quiz = re.search(r'Generate a Quiz on (.*?) of 10', prompt)
+        batch = re.search(r'Headings: (\[.*\])', prompt)
+        if roadmap:
+            text, output_tokens = self._roadmap(roadmap.group(1)), 300
+        elif quiz:
+            text, output_tokens = self._quiz(quiz.group(1)), 600
+        elif batch:
+            headings = json.loads(batch.group(1))
+            text = json.dumps({h: self._description(h) for h in headings})
+            output_tokens = self.description_tokens * len(headings)
+        elif prompt.startswith('give me full information on '):
+            text, output_tokens = self._description(prompt[len('give me full information on '):]), self.description_tokens
+        else:
+            text, output_tokens = f"Here is an answer to: {prompt[:80]}", 150
+
+        prompt_tokens = (len(prompt) + context) // 4 + 1
+        with self.lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+            failed = self.random.random() < self.failure_rate
+            factor = self.random.uniform(1 - self.jitter, 1 + self.jitter)
+            if failed:
+                self.failures += 1
+        time.sleep((self.overhead + output_tokens / self.tokens_per_second) * factor)
+        if failed:
+            raise google_exceptions.ServiceUnavailable("fake Gemini outage")
+        if stream:
+            return iter([FakeChunk(word + ' ') for word in text.split(' ')])
+        return FakeResponse(text, prompt_tokens, output_tokens)
+
+    @staticmethod
+    def _roadmap(topic):
+        title = topic.strip().title()
+        return json.dumps({
+            "id": re.sub(r'\s+', '-', topic.strip().lower()),
+            "title": title,
+            "description": f"A beginner friendly course on {title}.",
+            "modules": [
+                {"moduleTitle": f"{title} module {m}", "headings": [f"{title} topic {m}.{h}" for h in range(1, 5)]}
+                for m in range(1, 4)
+            ],
+        })
+
+    def _quiz(self, topic):
+        questions = []
+        for _ in range(10):
+            n = next(self.question_ids)
+            questions.append({"question": f"Question {n} about {topic}?",
+                              "options": ["optionA", "optionB", "optionC", "optionD"], "correct": "optionA"})
+        return json.dumps({"quiz": questions})
+
+
+class FakeBlobStore:
+    """Stand-in for Cloudinary raw uploads, served over HTTP from memory.
+
+    `upload` and `destroy` replace the cloudinary.uploader functions; blobs are
+    downloaded from a local WSGI app (see `wsgi_app`) so reads go through the
+    real HTTP client. Every operation takes `latency` seconds (+/- `jitter`)
+    and fails with probability `failure_rate`.
+    """
+
+    def __init__(self, latency=0.05, failure_rate=0.0, jitter=0.5, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.blobs = {}
+        self.ids = itertools.count()
+        self.base_url = None
+        self.stats = {'uploads': 0, 'downloads': 0, 'destroys': 0, 'failures': 0}
+
+    def _wait(self, operation):
+        with self.lock:
+            self.stats[operation] += 1
+            failed = self.random.random() < self.failure_rate
+            factor = self.random.uniform(1 - self.jitter, 1 + self.jitter)
+            if failed:
+                self.stats['failures'] += 1
+        time.sleep(self.latency * factor)
+        return failed
+
+    def upload(self, file, **kwargs):
+        data = file.read() if hasattr(file, 'read') else open(file, 'rb').read()
+        if self._wait('uploads'):
+            raise Exception("fake Cloudinary upload failed")
+        public_id = f"blob{next(self.ids)}"
+        with self.lock:
+            self.blobs[public_id] = data
+        return {"public_id": public_id, "secure_url": f"{self.base_url}/raw/upload/v1/{public_id}"}
+
+    def destroy(self, public_id, **kwargs):
+        if self._wait('destroys'):
+            raise Exception("fake Cloudinary destroy failed")
+        with self.lock:
+            found = self.blobs.pop(public_id, None) is not None
+        return {"result": "ok" if found else "not found"}
+
+    def wsgi_app(self, environ, start_response):
+        public_id = environ.get('PATH_INFO', '').rsplit('/', 1)[-1]
+        failed = self._wait('downloads')
+        with self.lock:
+            data = self.blobs.get(public_id)
+        if failed:
+            start_response('503 Service Unavailable', [('Content-Length', '0')])
+            return [b'']
+        if data is None:
+            start_response('404 Not Found', [('Content-Length', '0')])
+            return [b'']
+        start_response('200 OK', [('Content-Type', 'application/octet-stream'), ('Content-Length', str(len(data)))])
+        return [data]
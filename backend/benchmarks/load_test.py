@@ -0,0 +1,237 @@
+"""Offline load test: concurrent virtual users against the whole app.
+
+Serves wsgi.py on a local gevent WSGI server backed by SQLite, with FakeGemini
+in place of the model and FakeBlobStore in place of Cloudinary (both with
+configurable latency and failure rate). Each virtual user registers, logs in
+and then loops over search, get_module, the course listings, quiz and chat
+(one conversation per user) until time is up. Prints throughput, errors and
+p50/p95/p99 per endpoint.
+
+Results can be saved as a named baseline under benchmarks/baselines/ and later
+runs compared with it; the comparison exits with status 1 when an endpoint's
+p95 got worse than the tolerance allows.
+
+Run from the backend directory:
+    python benchmarks/load_test.py [--users 20] [--seconds 30] [--store cloudinary]
+    python benchmarks/load_test.py --save-baseline main
+    python benchmarks/load_test.py --compare main [--tolerance 0.2]
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import random  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+from collections import defaultdict  # noqa: E402
+
+import gevent  # noqa: E402
+import requests  # noqa: E402
+from gevent.pywsgi import WSGIServer  # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--users', type=int, default=20, help='concurrent virtual users')
+parser.add_argument('--seconds', type=float, default=30, help='duration of the run')
+parser.add_argument('--think-time', type=float, default=0.5, help='mean pause between requests of a user')
+parser.add_argument('--store', default='cloudinary', choices=('cloudinary', 'sql', 'local'))
+parser.add_argument('--model-overhead', type=float, default=0.3, help='fixed seconds per model call')
+parser.add_argument('--model-tokens-per-second', type=float, default=4000)
+parser.add_argument('--model-failure-rate', type=float, default=0.0)
+parser.add_argument('--blob-latency', type=float, default=0.05, help='seconds per blob upload/download')
+parser.add_argument('--blob-failure-rate', type=float, default=0.0)
+parser.add_argument('--rpm', type=float, default=100000, help='Gemini requests per minute allowed by the gateway')
+parser.add_argument('--bcrypt-rounds', type=int, default=10)
+parser.add_argument('--seed', type=int, default=1)
+parser.add_argument('--save-baseline', metavar='NAME', help='store the results as benchmarks/baselines/NAME.json')
+parser.add_argument('--compare', metavar='NAME', help='compare the results with a stored baseline')
+parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 increase over the baseline (0.2 = 20%%)')
+args = parser.parse_args()
+
+workdir = tempfile.mkdtemp(prefix='load_test_')
+os.environ.update({
+    'AIVEN_URL': f"sqlite:///{os.path.join(workdir, 'app.db')}",
+    'JWT_SECRET_KEY': 'load-test-secret-key-load-test-secret-key',
+    'GEMINI_API': 'unused',
+    'GEMINI_RPM': str(args.rpm),
+    'GEMINI_TPM': str(args.rpm * 100000),
+    'COURSE_STORE': args.store,
+    'COURSE_STORE_DIR': os.path.join(workdir, 'courses'),
+    'DESCRIPTION_CACHE_DB': os.path.join(workdir, 'descriptions.db'),
+    'TOPIC_CACHE_DB': os.path.join(workdir, 'topics.db'),
+    'QUIZ_POOL_DB': os.path.join(workdir, 'quiz.db'),
+    'JOB_DB': os.path.join(workdir, 'jobs.db'),
+    'CHAT_SESSION_DB': os.path.join(workdir, 'chat_sessions.db'),
+    'GEMINI_RATE_DB': os.path.join(workdir, 'gemini_rate.db'),
+    'BCRYPT_LOG_ROUNDS': str(args.bcrypt_rounds),
+})
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import cloudinary.uploader  # noqa: E402
+from wsgi import app  # noqa: E402
+from models import db  # noqa: E402
+from modelGateway import gateway  # noqa: E402
+from topicCache import topic_cache  # noqa: E402
+from benchmarks.fakes import FakeGemini, FakeBlobStore  # noqa: E402
+
+BASELINE_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'baselines')
+
+# Searched topics; earlier ones are more popular, like real traffic
+TOPICS = ['python', 'java', 'javascript', 'react', 'sql', 'machine learning', 'docker',
+          'c++', 'rust', 'kubernetes', 'data structures', 'go', 'typescript', 'linux']
+TOPIC_WEIGHTS = [1 / (rank + 1) for rank in range(len(TOPICS))]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else float('nan')
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def call(self, endpoint, method, url, **kwargs):
+        """Make a request, recording its latency; returns the response or None on a failure."""
+        start = time.perf_counter()
+        try:
+            response = method(url, timeout=120, **kwargs)
+        except requests.RequestException:
+            response = None
+        self.latencies[endpoint].append((time.perf_counter() - start) * 1000)
+        if response is None or response.status_code >= 400:
+            self.errors[endpoint] += 1
+            return None
+        return response
+
+
+def virtual_user(n, base, stop_at, recorder):
+    rng = random.Random(args.seed * 1000 + n)
+    session = requests.Session()
+    email = f'user{n}@example.com'
+    recorder.call('register', session.post, f'{base}/register',
+                  json={'name': f'user{n}', 'email': email, 'password': 'secret'})
+    response = recorder.call('login', session.post, f'{base}/login', json={'email': email, 'password': 'secret'})
+    if not response:
+        return
+    session.headers['Authorization'] = f"Bearer {response.json()['access_token']}"
+    chat_session = None
+
+    while time.perf_counter() < stop_at:
+        topic = rng.choices(TOPICS, TOPIC_WEIGHTS)[0]
+        response = recorder.call('search', session.get, f'{base}/api/courses/search', params={'query': topic})
+        if response:
+            course_id = response.json()['courses'][0]['id']
+            recorder.call('get_module', session.get, f'{base}/get_module', params={'course-id': course_id})
+        recorder.call('courses', session.get, f'{base}/api/courses')
+        recorder.call('summary', session.get, f'{base}/api/courses/summary', params={'fields': 'id,title'})
+        recorder.call('quiz', session.get, f'{base}/quiz', params={'topic': topic})
+        response = recorder.call('chat', session.post, f'{base}/chat',
+                                 json={'message': f'Explain {topic} in one line', 'session_id': chat_session})
+        if response:
+            # Later messages continue the same conversation
+            chat_session = response.json()['session_id']
+        gevent.sleep(rng.expovariate(1 / args.think_time) if args.think_time > 0 else 0)
+
+
+def summarize(recorder, elapsed):
+    results = {}
+    for endpoint, latencies in recorder.latencies.items():
+        results[endpoint] = {
+            'count': len(latencies),
+            'errors': recorder.errors[endpoint],
+            'rps': round(len(latencies) / elapsed, 2),
+            'p50': round(percentile(latencies, 50), 1),
+            'p95': round(percentile(latencies, 95), 1),
+            'p99': round(percentile(latencies, 99), 1),
+        }
+    return results
+
+
+def print_results(results, baseline=None):
+    print(f"{'endpoint':>12} {'count':>6} {'errors':>6} {'req/s':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+          + (f" {'p95 vs base':>12}" if baseline else ''))
+    for endpoint, stats in results.items():
+        line = (f"{endpoint:>12} {stats['count']:>6} {stats['errors']:>6} {stats['rps']:>7.2f} "
+                f"{stats['p50']:>9.1f} {stats['p95']:>9.1f} {stats['p99']:>9.1f}")
+        if baseline and endpoint in baseline:
+            line += f" {(stats['p95'] / baseline[endpoint]['p95'] - 1) * 100:>+11.1f}%"
+        print(line)
+
+
+def compare(results, baseline):
+    """Endpoints whose p95 grew by more than the tolerance, or that now have errors."""
+    regressions = []
+    for endpoint, base in baseline.items():
+        stats = results.get(endpoint)
+        if not stats:
+            continue
+        if stats['p95'] > base['p95'] * (1 + args.tolerance):
+            regressions.append(f"{endpoint}: p95 {base['p95']} -> {stats['p95']} ms")
+        if stats['errors'] > base['errors']:
+            regressions.append(f"{endpoint}: errors {base['errors']} -> {stats['errors']}")
+    return regressions
+
+
+def main():
+    model = FakeGemini(args.model_overhead, args.model_tokens_per_second,
+                       failure_rate=args.model_failure_rate, seed=args.seed)
+    blobs = FakeBlobStore(args.blob_latency, args.blob_failure_rate, seed=args.seed)
+    gateway.model = model
+    cloudinary.uploader.upload = blobs.upload
+    cloudinary.uploader.destroy = blobs.destroy
+
+    with app.app_context():
+        db.create_all()
+    blob_server = WSGIServer(('127.0.0.1', 0), blobs.wsgi_app, log=None)
+    blob_server.start()
+    blobs.base_url = f'http://127.0.0.1:{blob_server.server_port}'
+    server = WSGIServer(('127.0.0.1', 0), app, log=None)
+    server.start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    print(f"{args.users} users for {args.seconds:.0f}s, store {args.store}, model overhead {args.model_overhead}s "
+          f"(failure rate {args.model_failure_rate}), blob latency {args.blob_latency}s "
+          f"(failure rate {args.blob_failure_rate})")
+    recorder = Recorder()
+    start = time.perf_counter()
+    stop_at = start + args.seconds
+    gevent.joinall([gevent.spawn(virtual_user, n, base, stop_at, recorder) for n in range(args.users)])
+    elapsed = time.perf_counter() - start
+    server.stop()
+    blob_server.stop()
+
+    results = summarize(recorder, elapsed)
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json')) as f:
+            baseline = json.load(f)['endpoints']
+    print_results(results, baseline)
+    total = sum(stats['count'] for stats in results.values())
+    print(f"{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s); model calls {model.calls} "
+          f"({model.failures} failed), blobs {blobs.stats}, topic cache hit ratio {topic_cache.hit_ratio():.2f}")
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f'{args.save_baseline}.json')
+        config = {k: v for k, v in vars(args).items() if k not in ('save_baseline', 'compare', 'tolerance')}
+        with open(path, 'w') as f:
+            json.dump({'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'config': config, 'endpoints': results},
+                      f, indent=2)
+        print(f"baseline saved to {path}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regression against baseline '{args.compare}' (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
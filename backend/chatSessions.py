@@ -0,0 +1,90 @@
+import json
+import os
+import secrets
+import threading
+import time
+
+from modelGateway import estimate_tokens
+from sqliteLru import SqliteLru
+
+# SQLite file holding the conversations
+CHAT_SESSION_DB = os.getenv('CHAT_SESSION_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chat_sessions.db'))
+# Number of conversations kept before the least recently used are evicted
+CHAT_SESSION_MAX = int(os.getenv('CHAT_SESSION_MAX', 10000))
+# Seconds a conversation survives without a new message (default 1 day)
+CHAT_SESSION_TTL = float(os.getenv('CHAT_SESSION_TTL', 24 * 3600))
+# Estimated tokens of earlier turns sent with a message; older turns are dropped beyond it
+CHAT_HISTORY_TOKENS = int(os.getenv('CHAT_HISTORY_TOKENS', 2000))
+
+
+def trim_history(turns, budget=CHAT_HISTORY_TOKENS):
+    """Drop the oldest exchanges until the history fits the token budget.
+
+    Turns go in (user, model) pairs so the history still starts with a user
+    turn; the latest exchange is always kept.
+    """
+    while len(turns) > 2 and sum(estimate_tokens(turn['text']) for turn in turns) > budget:
+        turns = turns[2:]
+    return turns
+
+
+def chat_contents(turns, message):
+    """Gemini multi-turn contents: the kept history followed by the new user message."""
+    contents = [{'role': turn['role'], 'parts': [turn['text']]} for turn in turns]
+    contents.append({'role': 'user', 'parts': [message]})
+    return contents
+
+
+class ChatSessionStore:
+    """Server-side history of /chat conversations.
+
+    A session is an unguessable id mapped to its recent turns, so clients
+    send only their new message. The history is trimmed to
+    `history_tokens` when a turn is added, which keeps the prompt of every
+    turn about the same size however long the conversation gets. Sessions
+    expire after `ttl` idle seconds and the table is trimmed to
+    `max_sessions` rows, dropping the least recently used ones.
+    """
+
+    def __init__(self, path=CHAT_SESSION_DB, max_sessions=CHAT_SESSION_MAX, ttl=CHAT_SESSION_TTL,
+                 history_tokens=CHAT_HISTORY_TOKENS):
+        self.ttl = ttl
+        self.history_tokens = history_tokens
+        self.lock = threading.Lock()
+        self.stats = {'created': 0, 'resumed': 0, 'trimmed_turns': 0, 'evictions': 0}
+        self.table = SqliteLru(path, 'conversations', {'turns': 'TEXT NOT NULL'}, max_sessions)
+
+    def create(self):
+        """Start an empty conversation and return its id."""
+        session_id = secrets.token_urlsafe(16)
+        with self.lock:
+            self.stats['evictions'] += self.table.put(session_id, ('[]',), time.time() + self.ttl)
+            self.stats['created'] += 1
+        return session_id
+
+    def history(self, session_id):
+        """Return the kept turns of a conversation, or None if it is unknown or expired."""
+        with self.lock:
+            row = self.table.get(session_id)
+            if row is None:
+                return None
+            self.stats['resumed'] += 1
+            return json.loads(row[0])
+
+    def add_exchange(self, session_id, message, response):
+        """Record a user message and the model's answer, trimming the history to the budget."""
+        with self.lock:
+            row = self.table.get(session_id)
+            turns = json.loads(row[0]) if row else []
+            turns += [{'role': 'user', 'text': message}, {'role': 'model', 'text': response}]
+            kept = trim_history(turns, self.history_tokens)
+            self.stats['trimmed_turns'] += len(turns) - len(kept)
+            # A new message restarts the idle timeout
+            self.stats['evictions'] += self.table.put(session_id, (json.dumps(kept),), time.time() + self.ttl)
+
+    def end(self, session_id):
+        with self.lock:
+            self.table.delete(session_id)
+
+
+chat_sessions = ChatSessionStore()
@@ -1,13 +1,54 @@
-import google.generativeai as genai
-import os
-from dotenv import load_dotenv
+from resilience import resilient, gemini_breaker, is_retryable, DeadlineExceededError
+from modelGateway import gateway, PRIORITY_CHAT
+from chatSessions import chat_contents
 
-load_dotenv()
+FALLBACK_RESPONSE = "Sorry, I can't answer right now. Please try again in a little while."
 
-gemini_api = os.getenv('GEMINI_API')
-genai.configure(api_key=gemini_api)
-model = genai.GenerativeModel("gemini-1.5-flash")
+@resilient(fallback=lambda heading, history=(): FALLBACK_RESPONSE)
+def generate_bot_response(heading, history=()):
+    # Earlier turns of the conversation go along as multi-turn contents
+    response = gateway.generate_content(chat_contents(history, f"""{heading}"""), priority=PRIORITY_CHAT)
+    return response.text
 
-def generate_bot_response(heading):
-    response = model.generate_content(f"""{heading}""")
-    return response.text
\ No newline at end of file
+def stream_bot_response(heading, history=()):
+    """Yield the bot response in text chunks as the model produces them.
+
+    Closing the generator (for example when the client disconnects) cancels
+    the underlying model stream so no more tokens are generated.
+    """
+    gemini_breaker.before_call()
+    response = None
+    settled = False
+    try:
+        response = gateway.generate_content(chat_contents(history, f"""{heading}"""), priority=PRIORITY_CHAT, stream=True)
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunk without text parts (e.g. only safety ratings)
+                continue
+            if text:
+                yield text
+        gemini_breaker.record_success()
+        settled = True
+    except DeadlineExceededError:
+        raise
+    except Exception as e:
+        if is_retryable(e):
+            gemini_breaker.record_failure()
+        else:
+            # The upstream answered; the request itself was bad
+            gemini_breaker.record_success()
+        settled = True
+        raise
+    finally:
+        if not settled:
+            # Cancelled by the client, or gave up waiting for the rate limit: the
+            # upstream's health is unknown, so another call may be the breaker's trial
+            gemini_breaker.record_skipped()
+        # The SDK keeps the transport stream on the response; cancel it if it is still open
+        stream = getattr(response, '_iterator', None)
+        if hasattr(stream, 'cancel'):
+            stream.cancel()
+        elif hasattr(stream, 'close'):
+            stream.close()
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Clients to initialize when the app is imported instead of on first use: "all", or names
+# such as "genai,cloudinary". With gunicorn --preload this runs once in the master before
+# workers fork, so they share the imported modules. Importing the app opens no database
+# connection (SQLite files are connected per process, see localDb.py), so --preload is safe.
+PRELOAD_CLIENTS = os.getenv('PRELOAD_CLIENTS', '')
+
+
+class ClientRegistry:
+    """Process-wide, lazily created clients of heavy third-party libraries.
+
+    A client is built by its factory the first time it is asked for (importing
+    and configuring the library then), and shared afterwards. Initialization
+    times are kept for the startup benchmark and /metrics.
+    """
+
+    def __init__(self):
+        self.factories = {}
+        self.instances = {}
+        self.init_seconds = {}
+        self.lock = threading.Lock()
+
+    def register(self, name, factory):
+        self.factories[name] = factory
+
+    def get(self, name):
+        client = self.instances.get(name)
+        if client is not None:
+            return client
+        with self.lock:
+            if name not in self.instances:
+                start = time.perf_counter()
+                self.instances[name] = self.factories[name]()
+                self.init_seconds[name] = time.perf_counter() - start
+            return self.instances[name]
+
+    def loaded(self, name):
+        return name in self.instances
+
+    def preload(self, names=PRELOAD_CLIENTS):
+        """Initialize the named clients now ("all" for every registered one)."""
+        if names == 'all':
+            names = list(self.factories)
+        elif isinstance(names, str):
+            names = [name.strip() for name in names.split(',') if name.strip()]
+        for name in names:
+            self.get(name)
+
+
+def _genai():
+    # Only configures the SDK; no connection is opened until the first request, so this is fork safe
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv('GEMINI_API'))
+    return genai
+
+
+def _cloudinary():
+    import cloudinary
+    import cloudinary.uploader
+    cloudinary.config(
+        cloud_name=os.getenv('cloud_name'),
+        api_key=os.getenv('api_key'),
+        api_secret=os.getenv('api_secret')
+    )
+    return cloudinary.uploader
+
+
+clients = ClientRegistry()
+clients.register('genai', _genai)
+clients.register('cloudinary', _cloudinary)
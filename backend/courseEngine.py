@@ -0,0 +1,125 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from resilience import deadline_at
+
+# How many headings are generated at the same time for one course
+GEN_CONCURRENCY = int(os.getenv('COURSE_GEN_CONCURRENCY', 8))
+# Total time (in seconds) one request may spend generating a course
+GEN_DEADLINE = float(os.getenv('COURSE_GEN_DEADLINE', 120))
+# "per_heading" makes one request per heading; "batched" one per module, which is fewer calls but
+# must fit every description of a module in one response (a truncated answer costs a call per heading)
+GEN_MODE = os.getenv('COURSE_GEN_MODE', 'per_heading')
+
+PLACEHOLDER = "Description not available"
+
+
+def _until(give_up_at, fn):
+    """Run fn in a worker thread under the course deadline, so its Gemini calls stop waiting once it passes."""
+    def run(*args):
+        with deadline_at(give_up_at):
+            return fn(*args)
+    return run
+
+
+def course_skeleton(course):
+    """Build the detailed course structure from a roadmap entry, with empty descriptions."""
+    return {
+        "title": course["title"],
+        "id": course["id"],
+        "modules": [
+            {
+                "moduleTitle": module["moduleTitle"],
+                "headings": [{"heading": heading, "description": None} for heading in module["headings"]]
+            }
+            for module in course["modules"]
+        ]
+    }
+
+
+def iter_descriptions(course, generate, concurrency=GEN_CONCURRENCY, deadline=GEN_DEADLINE, generate_batch=None):
+    """Generate every heading of a roadmap course concurrently.
+
+    Yields (module_index, heading_index, description) in completion order. With
+    `generate_batch(module_title, headings) -> {heading: description}` each module
+    is generated in one call and only the headings missing from its answer fall
+    back to `generate(heading)`. A heading whose generation fails, or that is
+    still running when the deadline expires, is yielded with PLACEHOLDER.
+    """
+    modules = course["modules"]
+    if not any(module["headings"] for module in modules):
+        return
+
+    give_up_at = time.monotonic() + deadline
+    generate = _until(give_up_at, generate)
+    if generate_batch:
+        generate_batch = _until(give_up_at, generate_batch)
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    jobs = {}
+    if generate_batch:
+        for m, module in enumerate(modules):
+            if module["headings"]:
+                jobs[executor.submit(generate_batch, module["moduleTitle"], module["headings"])] = (m, None)
+    else:
+        for m, module in enumerate(modules):
+            for h, heading in enumerate(module["headings"]):
+                jobs[executor.submit(generate, heading)] = (m, h)
+
+    pending = set(jobs)
+    try:
+        while pending:
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                m, h = jobs.pop(future)
+                headings = modules[m]["headings"]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    label = modules[m]["moduleTitle"] if h is None else headings[h]
+                    print(f"Error generating '{label}': {e}")
+                    result = None
+
+                if h is not None:
+                    yield m, h, result or PLACEHOLDER
+                    continue
+
+                # Batched module: yield what came back, generate the rest one by one
+                result = result or {}
+                for h, heading in enumerate(headings):
+                    if result.get(heading):
+                        yield m, h, result[heading]
+                    else:
+                        retry = executor.submit(generate, heading)
+                        jobs[retry] = (m, h)
+                        pending.add(retry)
+
+        if pending:
+            print(f"Course generation deadline of {deadline}s reached, {len(pending)} jobs unfinished.")
+        for future in pending:
+            m, h = jobs[future]
+            for h in (range(len(modules[m]["headings"])) if h is None else [h]):
+                yield m, h, PLACEHOLDER
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def build_detailed_course(course, generate, concurrency=GEN_CONCURRENCY, deadline=GEN_DEADLINE, generate_batch=None):
+    """Return the detailed course for a roadmap entry, keeping module and heading order."""
+    detailed_course = course_skeleton(course)
+    for m, h, description in iter_descriptions(course, generate, concurrency, deadline, generate_batch):
+        detailed_course["modules"][m]["headings"][h]["description"] = description
+    return detailed_course
+
+
+
+def has_descriptions(detailed_course):
+    """True if at least one heading got a real description."""
+    return any(
+        heading["description"] and heading["description"] != PLACEHOLDER
+        for module in detailed_course["modules"]
+        for heading in module["headings"]
+    )
@@ -1,16 +1,20 @@
-import google.generativeai as genai
 import json
-import os
-from dotenv import load_dotenv
+from singleFlight import single_flight, normalize_key
+from resilience import resilient
+from modelGateway import gateway, MODEL_NAME, PRIORITY_COURSE
 
-load_dotenv()
-
-gemini_api = os.getenv('GEMINI_API')
-genai.configure(api_key=gemini_api)
-model = genai.GenerativeModel("gemini-1.5-flash")
+# Bump when the gen_course prompt changes so cached descriptions are regenerated
+COURSE_PROMPT_VERSION = 1
+# Bump when the gen_roadmap prompt changes so cached roadmaps are regenerated
+ROADMAP_PROMPT_VERSION = 1
+# Bump when the gen_module_descriptions prompt changes; named apart from COURSE_PROMPT_VERSION
+# because descriptions of both prompts share the description cache
+MODULE_PROMPT_VERSION = 'module-1'
 
+@single_flight()
+@resilient()
 def gen_roadmap(topic):
-    response = model.generate_content(f"""Generate a full course roadmap for the {topic}. Provide the output in JSON format, including the course title, a list of modules, and the headings under each module.
+    response = gateway.generate_content(f"""Generate a full course roadmap for the {topic}. Provide the output in JSON format, including the course title, a list of modules, and the headings under each module.
                 The structure should be as follows:
                 {{
                 "id": "Make id of quiz by replacing spaces with - and all lowercase letters on title",
@@ -28,9 +32,8 @@ def gen_roadmap(topic):
                 ]
                 }}
                 """,
-                generation_config=genai.GenerationConfig(
-                response_mime_type="application/json"
-                ),
+                priority=PRIORITY_COURSE,
+                generation_config={"response_mime_type": "application/json"},
             )
     
     fixed_response = f"[{response.text}]"
@@ -42,7 +45,46 @@ def gen_roadmap(topic):
         print("Error decoding JSON:", e)
         return
 
+@single_flight()
+@resilient()
 def gen_course(heading):
-    response = model.generate_content(f"""give me full information on {heading} with as much detail as possible without using copyright material""")
+    response = gateway.generate_content(f"""give me full information on {heading} with as much detail as possible without using copyright material""", priority=PRIORITY_COURSE)
     # print(response.text)
-    return response.text
\ No newline at end of file
+    return response.text
+
+def match_descriptions(data, headings):
+    """Map the requested headings to the descriptions found in a batched response.
+
+    Accepts {"heading": "description"} or [{"heading": ..., "description": ...}]
+    and matches headings case and whitespace insensitively. Headings without a
+    non-empty description are left out.
+    """
+    if isinstance(data, list):
+        data = {item.get('heading'): item.get('description') for item in data if isinstance(item, dict)}
+    if not isinstance(data, dict):
+        return {}
+    found = {normalize_key(key): value for key, value in data.items() if isinstance(key, str)}
+    descriptions = {}
+    for heading in headings:
+        description = found.get(normalize_key(heading))
+        if isinstance(description, str) and description.strip():
+            descriptions[heading] = description
+    return descriptions
+
+@single_flight(key=lambda module_title, headings: normalize_key(module_title + '|' + '|'.join(headings)))
+@resilient()
+def gen_module_descriptions(module_title, headings):
+    """Generate the descriptions of all headings of a module in one JSON-mode request."""
+    response = gateway.generate_content(f"""For each of the following headings of the module "{module_title}", give full information with as much detail as possible without using copyright material.
+                Return a JSON object that maps every heading, written exactly as given, to its description.
+                Headings: {json.dumps(headings)}
+                """,
+                priority=PRIORITY_COURSE,
+                generation_config={"response_mime_type": "application/json"},
+            )
+
+    try:
+        return match_descriptions(json.loads(response.text), headings)
+    except json.JSONDecodeError as e:
+        print("Error decoding JSON:", e)
+        return {}
@@ -0,0 +1,493 @@
+import hashlib
+import io
+import os
+import re
+import tempfile
+from urllib.parse import quote, urlparse
+
+from models import Course, CourseChange, Module, Heading
+from httpClient import fetch, fetch_all, FetchError
+from clients import clients
+from courseCodec import encode, decode
+from instrumentation import timed
+
+# Which backend keeps users' roadmaps and detailed courses: "cloudinary", "sql" or "local"
+COURSE_STORE = os.getenv('COURSE_STORE', 'cloudinary')
+# Directory used by the local backend
+COURSE_STORE_DIR = os.getenv('COURSE_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'course_store'))
+
+# Seconds allowed for one Cloudinary upload or destroy call
+UPLOAD_TIMEOUT = float(os.getenv('UPLOAD_TIMEOUT', 60))
+# Logged changes of a kind after which the Cloudinary backend folds them into a new snapshot
+COURSE_LOG_COMPACT_AFTER = int(os.getenv('COURSE_LOG_COMPACT_AFTER', 20))
+
+# Courses per page of the summary listing, by default and at most
+COURSE_PAGE_SIZE = int(os.getenv('COURSE_PAGE_SIZE', 20))
+MAX_COURSE_PAGE_SIZE = int(os.getenv('MAX_COURSE_PAGE_SIZE', 100))
+
+ROADMAP = 'roadmap'
+COURSE = 'course'
+
+# Fields a course summary can have; "detailed" tells whether the detailed course exists
+SUMMARY_FIELDS = ('id', 'title', 'description', 'detailed')
+# Fields sent when none are asked for; "detailed" is opt-in since some backends read every detailed course for it
+DEFAULT_SUMMARY_FIELDS = ('id', 'title', 'description')
+
+
+def public_id_from_url(url):
+    """Cloudinary public id of a delivery URL (.../raw/upload/v123/<public id>)."""
+    path = urlparse(url).path
+    if '/upload/' not in path:
+        return url
+    public_id = path.split('/upload/', 1)[1]
+    return re.sub(r'^v\d+/', '', public_id)
+
+
+def snapshot_url(location):
+    """Snapshot URL of a Cloudinary location, without the "#<last change id>" suffix."""
+    return location.split('#', 1)[0] if location else None
+
+
+def parse_fields(value):
+    """Summary fields requested as "id,title,..." (DEFAULT_SUMMARY_FIELDS when empty)."""
+    if not value:
+        return DEFAULT_SUMMARY_FIELDS
+    fields = tuple(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in SUMMARY_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(SUMMARY_FIELDS)}")
+    return fields
+
+
+def summarize(course, detailed, fields=SUMMARY_FIELDS):
+    summary = {"id": course['id'], "title": course['title'],
+               "description": course.get('description'), "detailed": detailed}
+    return {field: summary[field] for field in fields}
+
+
+def page(items, offset, limit):
+    return items[offset:offset + limit] if limit is not None else items[offset:]
+
+
+class StoreError(Exception):
+    """Raised when a store cannot read or write a user's courses."""
+
+
+def check_courses(courses):
+    """Raise StoreError unless `courses` is a list of courses, each with an id and a title."""
+    if not isinstance(courses, list) or not all(
+            isinstance(c, dict) and isinstance(c.get('id'), str) and 'title' in c for c in courses):
+        raise StoreError("Courses must be a list of objects with an id and a title.")
+
+
+def apply_change(courses, op, data):
+    """Courses after one logged change: "put" adds or replaces courses by id, "remove" drops a title."""
+    if op == 'put':
+        check_courses(data)
+        ids = {c['id'].lower() for c in data}
+        return [c for c in courses if c['id'].lower() not in ids] + data
+    if op == 'remove':
+        if not isinstance(data, str):
+            raise StoreError("A removed course must be given by its title.")
+        return [c for c in courses if c['title'] != data]
+    raise StoreError(f"Unknown course change: {op}")
+
+
+class CourseStore:
+    """Where a user's roadmap and detailed courses are kept.
+
+    `user` is always a User row. Backends record where the data lives in
+    `user.roadmap` / `user.course` and commit the session, so a falsy column
+    still means "nothing stored yet".
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def list_courses(self, user, kind):
+        """Return every course of a kind (ROADMAP or COURSE), oldest first."""
+        raise NotImplementedError
+
+    def get_course(self, user, kind, course_id):
+        """Return one course by id (case insensitive), or None."""
+        course_id = course_id.lower()
+        return next((c for c in self.list_courses(user, kind) if c['id'].lower() == course_id), None)
+
+    def list_summaries(self, user, offset=0, limit=None, fields=DEFAULT_SUMMARY_FIELDS):
+        """Return (summaries of one page of roadmap courses, total number of courses), oldest first."""
+        courses = self.list_courses(user, ROADMAP)
+        detailed = {c['id'].lower() for c in self.list_courses(user, COURSE)} if 'detailed' in fields else set()
+        return [summarize(c, c['id'].lower() in detailed, fields) for c in page(courses, offset, limit)], len(courses)
+
+    def add_courses(self, user, kind, courses):
+        """Append courses of a kind, replacing any stored course with the same id."""
+        raise NotImplementedError
+
+    def remove_course(self, user, title):
+        """Remove the course with this title from both kinds and return the remaining roadmap."""
+        raise NotImplementedError
+
+
+class CloudinaryCourseStore(CourseStore):
+    """Keeps each kind as a gzip compressed JSON snapshot on Cloudinary plus a change log in the database.
+
+    `user.roadmap`/`user.course` hold the snapshot URL, followed by
+    "#<last change id>" once changes were logged after it, so the location
+    still changes on every write. Adding or removing courses appends one
+    course_change row instead of re-uploading the whole blob; readers apply
+    the log to the snapshot. The first courses are logged too, against an
+    empty snapshot ("#<change id>"), so concurrent first writes of two workers
+    both land in the log. Once a kind has COURSE_LOG_COMPACT_AFTER changes
+    they are folded into a new snapshot.
+
+    Snapshots written before compression was introduced are plain JSON and are still read.
+    """
+
+    def list_courses(self, user, kind):
+        return self._load(user, [kind])[0]
+
+    def list_summaries(self, user, offset=0, limit=None, fields=DEFAULT_SUMMARY_FIELDS):
+        # A snapshot holds every course, so the whole roadmap is downloaded either way;
+        # "detailed" also downloads every detailed course, which is why it is opt-in
+        kinds = [ROADMAP, COURSE] if 'detailed' in fields else [ROADMAP]
+        courses, *detailed = self._load(user, kinds)
+        detailed_ids = {c['id'].lower() for c in detailed[0]} if detailed else set()
+        return [summarize(c, c['id'].lower() in detailed_ids, fields) for c in page(courses, offset, limit)], len(courses)
+
+    def add_courses(self, user, kind, courses):
+        check_courses(courses)
+        self._append(user, kind, 'put', courses)
+
+    def remove_course(self, user, title):
+        roadmap, detailed = self._load(user, [ROADMAP, COURSE])
+        remaining = [c for c in roadmap if c['title'] != title]
+        for kind, courses, left in ((ROADMAP, roadmap, remaining),
+                                    (COURSE, detailed, [c for c in detailed if c['title'] != title])):
+            if len(left) == len(courses):
+                continue
+            if left:
+                self._append(user, kind, 'remove', title)
+            else:
+                # Nothing left: clear the column, so "no courses" still reads as a falsy location
+                self._write(user, kind, [])
+        return remaining
+
+    def compact(self, user, kind):
+        """Fold the logged changes of a kind into a new snapshot."""
+        changes = self._changes(user, kind)
+        if changes:
+            courses = self._apply(self._download(snapshot_url(getattr(user, kind)), kind), changes)
+            self._write(user, kind, courses, upto=changes[-1].id)
+
+    def _load(self, user, kinds):
+        """Current courses of each kind: the snapshots are downloaded concurrently, then their logs applied."""
+        # The log is read here, since the session cannot be used from the download threads
+        changes = [self._changes(user, kind) for kind in kinds]
+        snapshots = fetch_all(lambda kind: self._download(snapshot_url(getattr(user, kind)), kind), kinds)
+        return [self._apply(courses, log) for courses, log in zip(snapshots, changes)]
+
+    @staticmethod
+    def _changes(user, kind):
+        return CourseChange.query.filter_by(user_id=user.id, kind=kind).order_by(CourseChange.id).all()
+
+    @staticmethod
+    def _apply(courses, changes):
+        for change in changes:
+            try:
+                courses = apply_change(courses, change.op, decode(change.payload))
+            except (ValueError, StoreError) as e:
+                # An unusable change is skipped here and dropped by the next compaction
+                print(f"Skipping course change {change.id} of user {change.user_id}: {e}")
+        return courses
+
+    @staticmethod
+    def _download(url, kind):
+        if not url:
+            return []
+        try:
+            return decode(fetch(url)) or []
+        except FetchError as e:
+            raise StoreError(f"Failed to fetch {kind} from Cloudinary: {e}")
+        except ValueError:
+            raise StoreError(f"Invalid {kind} document on Cloudinary.")
+
+    def _append(self, user, kind, op, data):
+        """Log one change: a single small row, whatever the number of stored courses."""
+        change = CourseChange(user_id=user.id, kind=kind, op=op, payload=encode(data))
+        self.db.session.add(change)
+        self.db.session.flush()
+        # Without a snapshot yet the location is just "#<change id>"
+        setattr(user, kind, f"{snapshot_url(getattr(user, kind)) or ''}#{change.id}")
+        self.db.session.commit()
+
+        logged = CourseChange.query.filter_by(user_id=user.id, kind=kind).count()
+        if logged >= COURSE_LOG_COMPACT_AFTER:
+            try:
+                self.compact(user, kind)
+            except StoreError as e:
+                # The change is already saved; compaction is retried on the next write
+                self.db.session.rollback()
+                print(f"Failed to compact {kind} log of user {user.id}: {e}")
+
+    def _write(self, user, kind, courses, upto=None):
+        """Replace a snapshot without touching the local disk.
+
+        The new version is uploaded from memory under a fresh public id. The
+        user row is pointed at it and the changes it includes (every logged
+        change, or those up to id `upto`) are deleted in one commit, before
+        the old snapshot is destroyed, so a failure at any step leaves the
+        previous version readable.
+        """
+        old_url = snapshot_url(getattr(user, kind))
+        new_url = None
+        if courses:
+            body = io.BytesIO(encode(courses))
+            try:
+                with timed('cloudinary', 'upload'):
+                    response = clients.get('cloudinary').upload(body, resource_type="raw", timeout=UPLOAD_TIMEOUT)
+            except Exception as e:
+                raise StoreError(f"Failed to upload {kind} to Cloudinary: {e}")
+            new_url = response.get('secure_url')
+            if not new_url:
+                raise StoreError(f"Failed to upload {kind} to Cloudinary.")
+
+        folded = CourseChange.query.filter_by(user_id=user.id, kind=kind)
+        if upto is not None:
+            folded = folded.filter(CourseChange.id <= upto)
+        folded.delete(synchronize_session=False)
+        # Changes logged meanwhile by another worker stay in the log, after the new snapshot
+        newer = self.db.session.query(self.db.func.max(CourseChange.id)).filter_by(user_id=user.id, kind=kind).scalar()
+        setattr(user, kind, f"{new_url}#{newer}" if new_url and newer else new_url)
+        self.db.session.commit()
+
+        if old_url:
+            try:
+                with timed('cloudinary', 'destroy'):
+                    clients.get('cloudinary').destroy(public_id_from_url(old_url), resource_type="raw", timeout=UPLOAD_TIMEOUT)
+            except Exception as e:
+                # The new version is already live; a leftover blob only costs storage
+                print(f"Failed to delete old {kind} blob {old_url}: {e}")
+
+
+class LocalCourseStore(CourseStore):
+    """Keeps one JSON file per course on the local filesystem.
+
+    Layout: <root>/<user key>/<kind>/<course id>.json plus an index.json per
+    kind holding course ids in insertion order, so reading or writing one
+    course never touches the others. The roadmap also keeps summary.json
+    (id -> title and description) so listings do not read every course. Files are stored gzip compressed (see
+    courseCodec); plain JSON files are still read. Used for development
+    and offline runs.
+    """
+
+    def __init__(self, db, root=COURSE_STORE_DIR):
+        super().__init__(db)
+        self.root = root
+
+    def list_courses(self, user, kind):
+        return [course for course in (self._read(user, kind, cid) for cid in self._index(user, kind)) if course]
+
+    def get_course(self, user, kind, course_id):
+        return self._read(user, kind, course_id)
+
+    def list_summaries(self, user, offset=0, limit=None, fields=DEFAULT_SUMMARY_FIELDS):
+        index = self._index(user, ROADMAP)
+        summaries = self._summaries(user)
+        detailed = set(self._index(user, COURSE)) if 'detailed' in fields else set()
+        result = []
+        for course_id in page(index, offset, limit):
+            # Roadmaps written before summary.json existed fall back to the course file
+            course = summaries.get(course_id) or self._read(user, ROADMAP, course_id)
+            if course:
+                result.append(summarize(course, course_id in detailed, fields))
+        return result, len(index)
+
+    def add_courses(self, user, kind, courses):
+        check_courses(courses)
+        index = self._index(user, kind)
+        for course in courses:
+            course_id = course['id'].lower()
+            self._write_json(self._course_path(user, kind, course_id), course)
+            if course_id not in index:
+                index.append(course_id)
+        if kind == ROADMAP:
+            summaries = self._summaries(user)
+            summaries.update({c['id'].lower(): summarize(c, False, ('id', 'title', 'description')) for c in courses})
+            self._write_json(self._summary_path(user), summaries)
+        self._write_json(self._index_path(user, kind), index)
+        self._mark(user, kind, True)
+
+    def remove_course(self, user, title):
+        remaining = []
+        for kind in (ROADMAP, COURSE):
+            index = self._index(user, kind)
+            kept = []
+            for course_id in index:
+                course = self._read(user, kind, course_id)
+                if course and course['title'] == title:
+                    os.remove(self._course_path(user, kind, course_id))
+                elif course:
+                    kept.append(course_id)
+                    if kind == ROADMAP:
+                        remaining.append(course)
+            if kept != index:
+                if kind == ROADMAP:
+                    summaries = self._summaries(user)
+                    self._write_json(self._summary_path(user), {cid: summaries[cid] for cid in kept if cid in summaries})
+                self._write_json(self._index_path(user, kind), kept)
+                self._mark(user, kind, bool(kept))
+        return remaining
+
+    def _user_dir(self, user):
+        return os.path.join(self.root, hashlib.sha256(user.email.lower().encode('utf-8')).hexdigest())
+
+    def _index_path(self, user, kind):
+        return os.path.join(self._user_dir(user), kind, 'index.json')
+
+    def _summary_path(self, user):
+        return os.path.join(self._user_dir(user), ROADMAP, 'summary.json')
+
+    def _course_path(self, user, kind, course_id):
+        return os.path.join(self._user_dir(user), kind, quote(course_id.lower(), safe='') + '.json')
+
+    def _index(self, user, kind):
+        return self._read_json(self._index_path(user, kind)) or []
+
+    def _summaries(self, user):
+        return self._read_json(self._summary_path(user)) or {}
+
+    def _read(self, user, kind, course_id):
+        return self._read_json(self._course_path(user, kind, course_id))
+
+    def _mark(self, user, kind, has_courses):
+        location = f'local://{self._user_dir(user)}/{kind}' if has_courses else None
+        if getattr(user, kind) != location:
+            setattr(user, kind, location)
+            self.db.session.commit()
+
+    @staticmethod
+    def _read_json(path):
+        try:
+            with open(path, 'rb') as f:
+                return decode(f.read())
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            raise StoreError(f"Invalid JSON in {path}.")
+
+    @staticmethod
+    def _write_json(path, data):
+        # Write to a temporary file first so readers never see a partial file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(encode(data))
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+
+class SqlCourseStore(CourseStore):
+    """Keeps courses in the roadmap_course / course_module / course_heading tables.
+
+    A roadmap entry and its detailed course share one row; the detailed course
+    exists once `detailed` is set and every heading has its description. Lookups
+    by id or title use the (user_id, course_key) and (user_id, title) indexes,
+    summary listings page through the (user_id, position) one.
+    """
+
+    LOCATION = 'sql://'
+
+    def list_courses(self, user, kind):
+        query = Course.query.filter_by(user_id=user.id)
+        if kind == COURSE:
+            return [c.to_detailed() for c in query.filter_by(detailed=True).order_by(Course.position)]
+        return [c.to_roadmap() for c in query.order_by(Course.position)]
+
+    def list_summaries(self, user, offset=0, limit=None, fields=DEFAULT_SUMMARY_FIELDS):
+        # Only the requested columns are read; modules and headings are never loaded
+        columns = {'id': Course.slug, 'title': Course.title, 'description': Course.description, 'detailed': Course.detailed}
+        total = self.db.session.query(self.db.func.count(Course.id)).filter(Course.user_id == user.id).scalar()
+        rows = (self.db.session.query(*[columns[field] for field in fields])
+                .filter(Course.user_id == user.id)
+                .order_by(Course.position)
+                .offset(offset).limit(limit))
+        return [dict(zip(fields, row)) for row in rows], total
+
+    def get_course(self, user, kind, course_id):
+        course = Course.query.filter_by(user_id=user.id, course_key=course_id.lower()).first()
+        if not course:
+            return None
+        if kind == COURSE:
+            return course.to_detailed() if course.detailed else None
+        return course.to_roadmap()
+
+    def add_courses(self, user, kind, courses):
+        check_courses(courses)
+        position = self.db.session.query(self.db.func.max(Course.position)).filter_by(user_id=user.id).scalar()
+        position = -1 if position is None else position
+        for data in courses:
+            row = Course.query.filter_by(user_id=user.id, course_key=data['id'].lower()).first()
+            if not row:
+                position += 1
+                row = Course(user_id=user.id, course_key=data['id'].lower(), position=position)
+                self.db.session.add(row)
+            row.slug = data['id']
+            row.title = data['title']
+            if kind == ROADMAP:
+                row.description = data.get('description')
+                if row.modules and self._outline(row) == self._outline_of(data):
+                    # Same roadmap saved again (e.g. from the topic cache): keep its detailed course
+                    continue
+            row.modules = [
+                Module(position=m, title=module['moduleTitle'], headings=[
+                    Heading(position=h, **self._heading(kind, heading))
+                    for h, heading in enumerate(module['headings'])
+                ])
+                for m, module in enumerate(data['modules'])
+            ]
+            # A detailed course counts once every heading has its description; a changed roadmap outline has none
+            row.detailed = kind == COURSE and all(h.description for module in row.modules for h in module.headings)
+        self._mark(user)
+        self.db.session.commit()
+
+    def remove_course(self, user, title):
+        for row in Course.query.filter_by(user_id=user.id, title=title):
+            self.db.session.delete(row)
+        self.db.session.flush()
+        remaining = self.list_courses(user, ROADMAP)
+        self._mark(user, has_courses=bool(remaining))
+        self.db.session.commit()
+        return remaining
+
+    @staticmethod
+    def _outline(row):
+        return [(module.title, [h.heading for h in module.headings]) for module in row.modules]
+
+    @staticmethod
+    def _outline_of(data):
+        return [(module['moduleTitle'], list(module['headings'])) for module in data['modules']]
+
+    @staticmethod
+    def _heading(kind, heading):
+        if kind == COURSE:
+            return {"heading": heading['heading'], "description": heading['description']}
+        return {"heading": heading, "description": None}
+
+    def _mark(self, user, has_courses=True):
+        has_detailed = Course.query.filter_by(user_id=user.id, detailed=True).first() is not None
+        user.roadmap = self.LOCATION + ROADMAP if has_courses else None
+        user.course = self.LOCATION + COURSE if has_detailed else None
+
+
+def create_course_store(db, backend=COURSE_STORE):
+    """Build the course store selected by the COURSE_STORE setting."""
+    if backend == 'sql':
+        return SqlCourseStore(db)
+    if backend == 'local':
+        return LocalCourseStore(db)
+    if backend == 'cloudinary':
+        return CloudinaryCourseStore(db)
+    raise ValueError(f"Unknown COURSE_STORE backend: {backend}")
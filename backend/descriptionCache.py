@@ -0,0 +1,52 @@
+import hashlib
+import os
+import re
+import time
+
+from courseGenerator import MODEL_NAME, COURSE_PROMPT_VERSION
+from sqliteLru import TwoTierCache
+
+# SQLite file used as the durable tier, shared by every worker on the instance
+CACHE_DB = os.getenv('DESCRIPTION_CACHE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'description_cache.db'))
+# Number of descriptions kept in process memory
+MEMORY_SIZE = int(os.getenv('DESCRIPTION_CACHE_MEMORY_SIZE', 512))
+# Number of descriptions kept in the durable tier before the least recently used are evicted
+MAX_ENTRIES = int(os.getenv('DESCRIPTION_CACHE_MAX_ENTRIES', 50000))
+# Lifetime of a cached description in seconds (default 30 days)
+TTL = float(os.getenv('DESCRIPTION_CACHE_TTL', 30 * 24 * 3600))
+
+
+def normalize_heading(heading):
+    """Fold case and whitespace so equivalent headings share one cache entry."""
+    return re.sub(r'\s+', ' ', heading).strip().lower()
+
+
+def cache_key(heading, model=MODEL_NAME, prompt_version=COURSE_PROMPT_VERSION):
+    """Content address of a heading description: model, prompt version and normalized heading."""
+    raw = f"{model}|{prompt_version}|{normalize_heading(heading)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class DescriptionCache(TwoTierCache):
+    """Two tier cache of generated heading descriptions, keyed by cache_key()."""
+
+    table = 'descriptions'
+    columns = {'description': 'TEXT NOT NULL', 'heading': 'TEXT NOT NULL'}
+
+    def __init__(self, path=CACHE_DB, memory_size=MEMORY_SIZE, max_entries=MAX_ENTRIES, ttl=TTL):
+        super().__init__(path, memory_size, max_entries, ttl)
+
+    def get(self, heading, prompt_version=COURSE_PROMPT_VERSION):
+        """Return the description cached for a heading by this prompt version, or None."""
+        with self.lock:
+            description = self._find(cache_key(heading, prompt_version=prompt_version), time.time())
+            if description is None:
+                self.stats['misses'] += 1
+            return description
+
+    def set(self, heading, description, prompt_version=COURSE_PROMPT_VERSION):
+        """Store a description freshly generated by this prompt version."""
+        self._store(cache_key(heading, prompt_version=prompt_version), description, normalize_heading(heading))
+
+
+description_cache = DescriptionCache()
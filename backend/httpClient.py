@@ -0,0 +1,78 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from instrumentation import timed
+
+# Keep-alive connections kept per host
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 20))
+# Seconds to establish a connection / to wait between bytes of the response
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 20))
+# Largest response body accepted, in bytes
+HTTP_MAX_RESPONSE_BYTES = int(os.getenv('HTTP_MAX_RESPONSE_BYTES', 20 * 1024 * 1024))
+
+CHUNK_SIZE = 64 * 1024
+
+
+class FetchError(Exception):
+    """Raised when a URL cannot be fetched, answers with an error status or is too large."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def create_session(pool_size=HTTP_POOL_SIZE):
+    """A requests session with keep-alive pooling and retries of idempotent GETs on 5xx."""
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504), allowed_methods=('GET',))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# Shared by every greenlet of the worker; urllib3's pools are safe to use concurrently
+session = create_session()
+
+
+def fetch(url, max_bytes=HTTP_MAX_RESPONSE_BYTES):
+    """GET a URL through the shared session and return the body as bytes."""
+    with timed('http', 'get'):
+        return _fetch(url, max_bytes)
+
+
+def _fetch(url, max_bytes):
+    try:
+        response = session.get(url, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), stream=True)
+    except requests.RequestException as e:
+        raise FetchError(f"Request to {url} failed: {e}")
+
+    try:
+        if response.status_code != 200:
+            raise FetchError(f"{url} answered {response.status_code}", response.status_code)
+        if int(response.headers.get('Content-Length') or 0) > max_bytes:
+            raise FetchError(f"{url} is larger than {max_bytes} bytes")
+
+        body = bytearray()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            body.extend(chunk)
+            if len(body) > max_bytes:
+                raise FetchError(f"{url} is larger than {max_bytes} bytes")
+        return bytes(body)
+    except requests.RequestException as e:
+        raise FetchError(f"Reading {url} failed: {e}")
+    finally:
+        response.close()
+
+
+def fetch_all(fetcher, urls):
+    """Run fetcher(url) for several URLs concurrently, returning results in order."""
+    if len(urls) < 2:
+        return [fetcher(url) for url in urls]
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        return list(executor.map(fetcher, urls))
@@ -0,0 +1,272 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# Requests slower than this many milliseconds have their profile printed; 0 disables profiling
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', 0))
+# Fraction of requests run under the profiler while profiling is enabled
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.1))
+# Directory where the profiles of slow requests are also saved (pstats format), if set
+PROFILE_DIR = os.getenv('PROFILE_DIR')
+# Functions listed per slow request profile
+PROFILE_TOP = 25
+
+# Histogram buckets in seconds, from a SQLite lookup to a long LLM generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.values = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self.lock:
+            series = self.values.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for key, series in sorted(self.values.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", bound)])} {count}')
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", "+Inf")])} {series[-1]}')
+                lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {round(series[-2], 6)}')
+                lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}')
+        return lines
+
+
+class Callback:
+    """A gauge or counter read from existing stats at scrape time.
+
+    `collect()` returns {label values tuple: number}.
+    """
+
+    def __init__(self, name, help, kind, labelnames, collect):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        try:
+            values = self.collect()
+        except Exception as e:
+            print(f"Failed to collect metric {self.name}: {e}")
+            return lines
+        for key, value in sorted(values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Registry:
+    """Process-wide set of metrics, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, labelnames, collect, kind='gauge'):
+        return self._add(Callback(name, help, kind, labelnames, collect))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'Time to produce a response, per route', ('route', 'method', 'status'))
+DEPENDENCY_SECONDS = registry.histogram(
+    'dependency_duration_seconds', 'Time spent in calls to Gemini, Cloudinary, HTTP and the database',
+    ('dependency', 'operation', 'outcome'))
+LLM_TOKENS = registry.counter('llm_tokens_total', 'Gemini tokens used, per kind of call', ('kind', 'type'))
+LLM_RETRIES = registry.counter('llm_retries_total', 'Gemini calls retried after a retryable error', ('function',))
+LLM_FALLBACKS = registry.counter('llm_fallbacks_total', 'Gemini calls answered with a fallback', ('function',))
+
+
+@contextmanager
+def timed(dependency, operation):
+    """Observe the duration of a dependency call, labelled ok or error by its outcome."""
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        DEPENDENCY_SECONDS.observe(time.perf_counter() - start,
+                                   dependency=dependency, operation=operation, outcome=outcome)
+
+
+def record_tokens(kind, prompt_tokens, output_tokens):
+    LLM_TOKENS.inc(prompt_tokens, kind=kind, type='prompt')
+    LLM_TOKENS.inc(output_tokens, kind=kind, type='output')
+
+
+# Database statements and commits, for every engine and session of the process
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started_at')
+    if started:
+        DEPENDENCY_SECONDS.observe(time.perf_counter() - started.pop(), dependency='db', operation='query', outcome='ok')
+
+
+@event.listens_for(Engine, 'handle_error')
+def _execute_failed(context):
+    started = context.connection.info.get('query_started_at') if context.connection is not None else None
+    if started:
+        DEPENDENCY_SECONDS.observe(time.perf_counter() - started.pop(), dependency='db', operation='query', outcome='error')
+
+
+@event.listens_for(Session, 'before_commit')
+def _before_commit(session):
+    session.info['commit_started_at'] = time.perf_counter()
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    started = session.info.pop('commit_started_at', None)
+    if started is not None:
+        DEPENDENCY_SECONDS.observe(time.perf_counter() - started, dependency='db', operation='commit', outcome='ok')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    started = session.info.pop('commit_started_at', None)
+    if started is not None:
+        DEPENDENCY_SECONDS.observe(time.perf_counter() - started, dependency='db', operation='commit', outcome='error')
+
+
+class RequestProfiler:
+    """Runs a sample of requests under cProfile and reports the ones slower than a threshold.
+
+    At most one request of the process is profiled at a time: a profiler
+    started while another one runs would fail (Python 3.12+) or disturb its
+    timings. Under gevent every greenlet runs on the same thread, so a profile
+    also includes the time spent by other requests while the sampled one
+    waited on I/O; read it as a picture of the process during that request.
+    """
+
+    def __init__(self, slow_ms=PROFILE_SLOW_MS, sample_rate=PROFILE_SAMPLE_RATE, directory=PROFILE_DIR):
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.directory = directory
+        # Held by the request being profiled
+        self.running = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.slow_ms > 0 and self.sample_rate > 0
+
+    def start(self):
+        """Return a running profiler for this request, or None when it is not sampled."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        if not self.running.acquire(blocking=False):
+            # Another request is being profiled; this one is not sampled
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # A profiler started outside of this class is active
+            self.running.release()
+            return None
+        return profiler
+
+    def discard(self, profiler):
+        """Stop a profiler without reporting it, letting another request be profiled."""
+        profiler.disable()
+        self.running.release()
+
+    def finish(self, profiler, label, elapsed_ms):
+        self.discard(profiler)
+        if elapsed_ms < self.slow_ms:
+            return
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        print(f"Slow request {label}: {elapsed_ms:.0f} ms\n{out.getvalue()}")
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{label.replace('/', '_').replace(' ', '_')}.prof"
+            profiler.dump_stats(os.path.join(self.directory, name))
+
+
+request_profiler = RequestProfiler()
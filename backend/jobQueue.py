@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+from localDb import LocalDb
+
+# SQLite file holding queued, running and finished jobs; shared by every worker process
+JOB_DB = os.getenv('JOB_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.db'))
+# Jobs run at the same time in one process; keeps generation from starving other requests
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+# A running job not updated for this many seconds is assumed lost (worker died) and requeued
+JOB_LEASE = float(os.getenv('JOB_LEASE', 600))
+# Finished jobs are deleted after this many seconds
+JOB_RETENTION = float(os.getenv('JOB_RETENTION', 24 * 3600))
+# How often idle workers look for jobs queued by other processes
+POLL_INTERVAL = 1.0
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueue:
+    """SQLite backed job queue with a fixed pool of worker threads.
+
+    Handlers are registered per job kind and called as handler(payload, progress),
+    where progress(fraction) records how far the job is. Jobs survive restarts:
+    queued jobs stay queued and running jobs whose lease expired are picked up again.
+    """
+
+    def __init__(self, path=JOB_DB, workers=JOB_WORKERS, lease=JOB_LEASE):
+        self.workers = workers
+        self.lease = lease
+        self.handlers = {}
+        self.threads = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+
+        self.conn = LocalDb(
+            path,
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, kind TEXT NOT NULL, owner TEXT, payload TEXT NOT NULL, '
+            'status TEXT NOT NULL, progress REAL NOT NULL DEFAULT 0, result TEXT, error TEXT, '
+            'claim TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)',
+            'CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)'
+        )
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def enqueue(self, kind, payload, owner=None):
+        """Queue a job and return its id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO jobs (id, kind, owner, payload, status, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, kind, owner, json.dumps(payload), QUEUED, now, now)
+            )
+        self.start()
+        self.wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """Return a job as a dict, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT id, kind, owner, status, progress, result, error, created_at, updated_at '
+                'FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "owner": row[2],
+            "status": row[3],
+            "progress": row[4],
+            "result": json.loads(row[5]) if row[5] else None,
+            "error": row[6],
+            "created_at": row[7],
+            "updated_at": row[8],
+        }
+
+    def depth(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (QUEUED,)).fetchone()[0]
+
+    def start(self):
+        """Start the worker threads of this process (once)."""
+        with self.lock:
+            if self.threads:
+                return
+            self.threads = [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def _claim(self):
+        """Atomically take the oldest runnable job, returning (id, kind, payload) or None."""
+        claim = uuid.uuid4().hex
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                'UPDATE jobs SET status = ?, claim = ?, updated_at = ? WHERE id = ('
+                'SELECT id FROM jobs WHERE status = ? OR (status = ? AND updated_at < ?) '
+                'ORDER BY created_at LIMIT 1)',
+                (RUNNING, claim, now, QUEUED, RUNNING, now - self.lease)
+            )
+            return self.conn.execute('SELECT id, kind, payload FROM jobs WHERE claim = ?', (claim,)).fetchone()
+
+    def _update(self, job_id, **fields):
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        with self.lock:
+            self.conn.execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+
+    def _cleanup(self):
+        with self.lock:
+            self.conn.execute(
+                'DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?',
+                (DONE, FAILED, time.time() - JOB_RETENTION)
+            )
+
+    def _work(self):
+        while True:
+            job = self._claim()
+            if not job:
+                self._cleanup()
+                self.wakeup.wait(POLL_INTERVAL)
+                self.wakeup.clear()
+                continue
+
+            job_id, kind, payload = job
+            handler = self.handlers.get(kind)
+            try:
+                if not handler:
+                    raise ValueError(f"No handler registered for job kind '{kind}'")
+                result = handler(json.loads(payload), lambda fraction: self._update(job_id, progress=fraction))
+                self._update(job_id, status=DONE, progress=1.0, result=json.dumps(result))
+            except Exception as e:
+                print(f"Job {job_id} ({kind}) failed: {e}")
+                self._update(job_id, status=FAILED, error=str(e))
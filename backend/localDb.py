@@ -0,0 +1,46 @@
+import os
+import sqlite3
+import threading
+
+
+class LocalDb:
+    """SQLite file on the instance, connected on first use in each process.
+
+    A connection must not be used across fork(). With gunicorn --preload the
+    app is imported once in the master, so nothing is opened at import time:
+    each worker connects when it first runs a statement, and a process that
+    finds a connection inherited from its parent opens its own. `setup`
+    statements (pragmas, CREATE TABLE IF NOT EXISTS) run on every new
+    connection.
+    """
+
+    def __init__(self, path, *setup):
+        self.path = path
+        self.setup = setup
+        self.conn = None
+        self.pid = None
+        self.inherited = None
+        self.lock = threading.Lock()
+
+    def connection(self):
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    # Keep the parent's connection referenced: closing it here could disturb the parent
+                    self.inherited = self.conn
+                    conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    for statement in self.setup:
+                        conn.execute(statement)
+                    self.conn, self.pid = conn, os.getpid()
+        return self.conn
+
+    def execute(self, *args):
+        return self.connection().execute(*args)
+
+    def executemany(self, *args):
+        return self.connection().executemany(*args)
+
+    @property
+    def total_changes(self):
+        return self.connection().total_changes
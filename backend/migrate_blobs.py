@@ -0,0 +1,48 @@
+"""Import users' roadmap and detailed-course blobs from Cloudinary into the SQL course tables.
+
+Run once from the backend directory before setting COURSE_STORE=sql:
+    python migrate_blobs.py [--dry-run]
+
+The blobs themselves are left on Cloudinary; their old URLs are printed so
+they can be removed once the import has been checked.
+"""
+import argparse
+
+from app import app
+from models import db, User
+from courseStore import CloudinaryCourseStore, SqlCourseStore, ROADMAP, COURSE, snapshot_url
+
+
+def migrate(dry_run=False):
+    with app.app_context():
+        db.create_all()
+        cloudinary_store = CloudinaryCourseStore(db)
+        sql_store = SqlCourseStore(db)
+
+        # "#<change id>": courses only in the change log, with no snapshot uploaded yet
+        users = User.query.filter(db.or_(User.roadmap.like('http%'), User.course.like('http%'),
+                                         User.roadmap.like('#%'), User.course.like('#%'))).all()
+        print(f"{len(users)} users with Cloudinary blobs")
+
+        for user in users:
+            old_urls = [snapshot_url(url) for url in (user.roadmap, user.course) if snapshot_url(url)]
+            try:
+                # Download both blobs before the SQL store replaces the URLs on the user
+                roadmap = cloudinary_store.list_courses(user, ROADMAP)
+                detailed = cloudinary_store.list_courses(user, COURSE)
+                print(f"{user.email}: {len(roadmap)} roadmap courses, {len(detailed)} detailed courses")
+                if dry_run:
+                    continue
+                sql_store.add_courses(user, ROADMAP, roadmap)
+                sql_store.add_courses(user, COURSE, detailed)
+                print(f"  imported, old blobs: {', '.join(old_urls)}")
+            except Exception as e:
+                db.session.rollback()
+                print(f"  failed to import {user.email}: {e}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true', help='only download and count, do not write')
+    args = parser.parse_args()
+    migrate(dry_run=args.dry_run)
@@ -0,0 +1,211 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from clients import clients
+from instrumentation import timed, record_tokens
+from localDb import LocalDb
+from resilience import DeadlineExceededError, current_deadline
+
+MODEL_NAME = "gemini-1.5-flash"
+# Quota of the Gemini key (defaults: free tier of gemini-1.5-flash), shared by every worker on the instance.
+# With several instances on one key, set them to each instance's share of the quota.
+GEMINI_RPM = float(os.getenv('GEMINI_RPM', 15))
+GEMINI_TPM = float(os.getenv('GEMINI_TPM', 1000000))
+# SQLite file holding the rate limit buckets of the instance; empty keeps them per process
+GEMINI_RATE_DB = os.getenv('GEMINI_RATE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gemini_rate.db'))
+
+# Lower value is served first
+PRIORITY_CHAT = 0
+PRIORITY_QUIZ = 1
+PRIORITY_COURSE = 2
+PRIORITY_NAMES = {PRIORITY_CHAT: 'chat', PRIORITY_QUIZ: 'quiz', PRIORITY_COURSE: 'course'}
+
+# Expected output size per kind of call, used until the real usage is known
+EXPECTED_OUTPUT_TOKENS = {PRIORITY_CHAT: 500, PRIORITY_QUIZ: 1000, PRIORITY_COURSE: 2000}
+
+
+def estimate_tokens(prompt):
+    """Rough token count of a prompt (about four characters per token)."""
+    return len(str(prompt)) // 4 + 1
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` tokens, refilled at `rate` tokens per second.
+
+    The level may go negative when a call turns out to cost more than was
+    reserved; later callers then wait for the debt to be refilled.
+
+    With a `db` (LocalDb with a rate_buckets table) the level is kept in the
+    row `name`, so every worker process on the instance draws from the same
+    bucket. time.monotonic() is the system-wide monotonic clock on Linux, so
+    the processes agree on when the bucket was last refilled.
+    """
+
+    def __init__(self, capacity, rate, db=None, name=None):
+        self.capacity = capacity
+        self.rate = rate
+        self.db = db
+        self.name = name
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        if self.db is not None:
+            row = self.db.execute('SELECT level, updated FROM rate_buckets WHERE name = ?', (self.name,)).fetchone()
+            if row:
+                self.level, self.updated = row
+        now = time.monotonic()
+        # A row older than the last reboot has a later timestamp; it only restarts the refill
+        self.level = min(self.capacity, self.level + max(0, now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` tokens are available (0 if they are now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0
+        return (amount - self.level) / self.rate
+
+    def available(self):
+        """Tokens in the bucket now (negative while in debt)."""
+        self._refill()
+        return self.level
+
+    def take(self, amount):
+        if self.db is None:
+            self._refill()
+            self.level -= amount
+            return
+        # Read and write in one transaction so takes of other workers are not lost
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            self._refill()
+            self.level -= amount
+            self.db.execute('INSERT OR REPLACE INTO rate_buckets (name, level, updated) VALUES (?, ?, ?)',
+                            (self.name, self.level, self.updated))
+        except Exception:
+            self.db.execute('ROLLBACK')
+            raise
+        self.db.execute('COMMIT')
+
+
+class ModelGateway:
+    """The one Gemini model of the process, behind request and token rate limits.
+
+    Callers wait in a priority queue (chat before quiz before course generation)
+    until both the requests-per-minute and tokens-per-minute buckets allow
+    their call. With `rate_db` the buckets are shared by the worker processes
+    of the instance, while each process orders its own callers. Wait times and
+    queue depth are kept for monitoring.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, rpm=GEMINI_RPM, tpm=GEMINI_TPM, rate_db=GEMINI_RATE_DB):
+        self.model_name = model_name
+        self._model = None
+        db = LocalDb(
+            rate_db,
+            'CREATE TABLE IF NOT EXISTS rate_buckets (name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)'
+        ) if rate_db else None
+        self.requests = TokenBucket(rpm, rpm / 60, db, 'requests')
+        self.tokens = TokenBucket(tpm, tpm / 60, db, 'tokens')
+        self.cond = threading.Condition()
+        self.waiting = []
+        self.sequence = itertools.count()
+        self.stats = {
+            name: {'calls': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0, 'tokens': 0, 'deadline_exceeded': 0}
+            for name in PRIORITY_NAMES.values()
+        }
+
+    @property
+    def model(self):
+        """The GenerativeModel, created (and the SDK imported) on first use."""
+        if self._model is None:
+            self._model = clients.get('genai').GenerativeModel(self.model_name)
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    def generate_content(self, prompt, priority=PRIORITY_COURSE, deadline=None, **kwargs):
+        """model.generate_content, once the rate limits allow it.
+
+        `deadline` is a time.monotonic() value, by default the one of the
+        enclosing @resilient call; DeadlineExceededError is raised when the
+        rate limits would not allow the call before it.
+        """
+        kind = PRIORITY_NAMES[priority]
+        reserved = estimate_tokens(prompt) + EXPECTED_OUTPUT_TOKENS.get(priority, 1000)
+        with timed('gemini', 'rate_limit_wait'):
+            self.acquire(priority, reserved, deadline if deadline is not None else current_deadline())
+        with timed('gemini', kind):
+            response = self.model.generate_content(prompt, **kwargs)
+
+        # Settle the reservation against the real usage when the response reports it
+        usage = getattr(response, 'usage_metadata', None)
+        used = getattr(usage, 'total_token_count', 0) if not kwargs.get('stream') else 0
+        if used:
+            record_tokens(kind, getattr(usage, 'prompt_token_count', 0), getattr(usage, 'candidates_token_count', 0))
+        with self.cond:
+            if used:
+                self.tokens.take(used - reserved)
+            self.stats[kind]['tokens'] += used or reserved
+        return response
+
+    def acquire(self, priority, tokens, deadline=None):
+        """Block until this caller is first in line and both buckets have room.
+
+        Raises DeadlineExceededError, without taking from the buckets, once
+        that would happen after `deadline` (a time.monotonic() value).
+        """
+        start = time.monotonic()
+        entry = (priority, next(self.sequence))
+        with self.cond:
+            heapq.heappush(self.waiting, entry)
+            try:
+                while True:
+                    wait = None
+                    if self.waiting[0] == entry:
+                        wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                        if wait <= 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            break
+                    if deadline is not None:
+                        left = deadline - time.monotonic()
+                        if left <= 0 or (wait is not None and wait >= left):
+                            self.stats[PRIORITY_NAMES[priority]]['deadline_exceeded'] += 1
+                            raise DeadlineExceededError("Gave up waiting for the Gemini rate limit")
+                        # Not first in line: wake up in time to give up
+                        wait = left if wait is None else wait
+                    self.cond.wait(wait)
+            finally:
+                self.waiting.remove(entry)
+                heapq.heapify(self.waiting)
+                self.cond.notify_all()
+
+            waited = time.monotonic() - start
+            stats = self.stats[PRIORITY_NAMES[priority]]
+            stats['calls'] += 1
+            stats['wait_seconds'] += waited
+            stats['max_wait_seconds'] = max(stats['max_wait_seconds'], waited)
+
+    def metrics(self):
+        """Queue depth per priority and wait statistics."""
+        with self.cond:
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self.waiting:
+                depth[PRIORITY_NAMES[priority]] += 1
+            return {
+                "queue_depth": depth,
+                "requests_available": round(self.requests.available(), 2),
+                "tokens_available": round(self.tokens.available()),
+                "calls": {name: dict(stats) for name, stats in self.stats.items()},
+            }
+
+
+gateway = ModelGateway()
@@ -0,0 +1,96 @@
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
+
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(50), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password = db.Column(db.String(128), nullable=False)
+    roadmap = db.Column(db.Text, nullable=True)  # Store roadmap file URL
+    course = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f"<User {self.username}>"
+
+
+class Course(db.Model):
+    """One roadmap entry of a user; becomes a detailed course once its headings have descriptions."""
+    __tablename__ = 'roadmap_course'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'course_key', name='uq_roadmap_course_user_key'),
+        db.Index('ix_roadmap_course_user_title', 'user_id', 'title'),
+        db.Index('ix_roadmap_course_user_position', 'user_id', 'position'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    course_key = db.Column(db.String(255), nullable=False)  # lowercased course id used for lookups
+    slug = db.Column(db.String(255), nullable=False)  # course id as generated
+    title = db.Column(db.String(255), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    detailed = db.Column(db.Boolean, nullable=False, default=False)
+    modules = db.relationship('Module', order_by='Module.position', cascade='all, delete-orphan',
+                              lazy='selectin', backref='course')
+
+    def to_roadmap(self):
+        return {
+            "id": self.slug,
+            "title": self.title,
+            "description": self.description,
+            "modules": [
+                {"moduleTitle": module.title, "headings": [h.heading for h in module.headings]}
+                for module in self.modules
+            ]
+        }
+
+    def to_detailed(self):
+        return {
+            "title": self.title,
+            "id": self.slug,
+            "modules": [
+                {
+                    "moduleTitle": module.title,
+                    "headings": [{"heading": h.heading, "description": h.description} for h in module.headings]
+                }
+                for module in self.modules
+            ]
+        }
+
+    def __repr__(self):
+        return f"<Course {self.course_key}>"
+
+
+class Module(db.Model):
+    __tablename__ = 'course_module'
+
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('roadmap_course.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(255), nullable=False)
+    headings = db.relationship('Heading', order_by='Heading.position', cascade='all, delete-orphan',
+                               lazy='selectin', backref='module')
+
+
+class Heading(db.Model):
+    __tablename__ = 'course_heading'
+
+    id = db.Column(db.Integer, primary_key=True)
+    module_id = db.Column(db.Integer, db.ForeignKey('course_module.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    heading = db.Column(db.Text, nullable=False)
+    description = db.Column(db.Text, nullable=True)
+
+
+class CourseChange(db.Model):
+    """One add or remove made to a user's roadmap or detailed-course blob since its last snapshot."""
+    __tablename__ = 'course_change'
+    __table_args__ = (db.Index('ix_course_change_user_kind', 'user_id', 'kind', 'id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    kind = db.Column(db.String(16), nullable=False)  # "roadmap" or "course"
+    op = db.Column(db.String(16), nullable=False)  # "put" (courses) or "remove" (a title)
+    payload = db.Column(db.LargeBinary(length=16 * 1024 * 1024), nullable=False)  # encoded with courseCodec
@@ -0,0 +1,33 @@
+import os
+
+from gevent.threadpool import ThreadPool
+
+# bcrypt cost factor (log2 of the number of rounds)
+BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+# OS threads used for hashing; 0 hashes inline on the calling greenlet
+PASSWORD_POOL_SIZE = int(os.getenv('PASSWORD_POOL_SIZE', 4))
+
+
+class PasswordHasher:
+    """Runs Flask-Bcrypt hashing and verification on a pool of real OS threads.
+
+    bcrypt is CPU bound and never yields to gevent, so running it on the
+    worker's event loop stalls every other greenlet for the whole hash. The
+    gevent thread pool runs it in native threads (bcrypt releases the GIL) and
+    only the calling greenlet waits.
+    """
+
+    def __init__(self, bcrypt, pool_size=PASSWORD_POOL_SIZE):
+        self.bcrypt = bcrypt
+        self.pool = ThreadPool(pool_size) if pool_size > 0 else None
+
+    def _run(self, fn, *args):
+        if self.pool is None:
+            return fn(*args)
+        return self.pool.apply(fn, args)
+
+    def hash(self, password):
+        return self._run(self.bcrypt.generate_password_hash, password).decode('utf-8')
+
+    def check(self, password_hash, password):
+        return self._run(self.bcrypt.check_password_hash, password_hash, password)
@@ -1,16 +1,12 @@
-import google.generativeai as genai
 import json
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-gemini_api = os.getenv('GEMINI_API')
-genai.configure(api_key=gemini_api)
-model = genai.GenerativeModel("gemini-1.5-flash")
+from singleFlight import single_flight
+from resilience import resilient
+from modelGateway import gateway, PRIORITY_QUIZ
 
+@single_flight()
+@resilient()
 def generate_quiz(topic):
-    response = model.generate_content(f"""Generate a Quiz on {topic} of 10 mcq type questions.
+    response = gateway.generate_content(f"""Generate a Quiz on {topic} of 10 mcq type questions.
         Generate output in json format with structure as follows:
         {{
         "question": "Make question on topic",
@@ -18,9 +14,8 @@ def generate_quiz(topic):
         "correct": "Correct Option Name like optionA or optionB or so on..." 
         }}
         """,
-        generation_config=genai.GenerationConfig(
-            response_mime_type="application/json"
-        ),
+        priority=PRIORITY_QUIZ,
+        generation_config={"response_mime_type": "application/json"},
     )
 
     fixed_response = f"[{response.text}]"
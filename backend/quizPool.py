@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+from localDb import LocalDb
+from singleFlight import normalize_key
+
+# SQLite file holding the generated questions of every topic
+QUIZ_POOL_DB = os.getenv('QUIZ_POOL_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quiz_pool.db'))
+# Number of questions the background worker keeps per topic
+QUIZ_POOL_TARGET = int(os.getenv('QUIZ_POOL_TARGET', 40))
+# A topic with fewer questions than this is queued for a refill
+QUIZ_POOL_LOW_WATER = int(os.getenv('QUIZ_POOL_LOW_WATER', 20))
+# Questions served per quiz
+QUIZ_SIZE = int(os.getenv('QUIZ_SIZE', 10))
+# Generation attempts per refill, so a model that keeps repeating itself cannot loop forever
+MAX_REFILL_ATTEMPTS = 6
+
+
+def extract_questions(quiz_data):
+    """Pull the question dicts out of a generate_quiz result.
+
+    The model answers either with {"quiz": [...]} or with the questions
+    themselves, and generate_quiz wraps that in a list.
+    """
+    questions = []
+    for item in quiz_data or []:
+        if isinstance(item, dict) and isinstance(item.get('quiz'), list):
+            questions.extend(item['quiz'])
+        elif isinstance(item, list):
+            questions.extend(item)
+        elif isinstance(item, dict) and 'question' in item:
+            questions.append(item)
+    return [q for q in questions if isinstance(q, dict) and q.get('question')]
+
+
+class QuizPool:
+    """Per-topic pool of generated quiz questions with background refill.
+
+    Quizzes are sampled from the pool, preferring questions the user has not
+    been served yet. A worker thread tops up topics that fall below the
+    low-water mark, so a quiz request normally only reads SQLite.
+    """
+
+    def __init__(self, generate, path=QUIZ_POOL_DB, target=QUIZ_POOL_TARGET,
+                 low_water=QUIZ_POOL_LOW_WATER, quiz_size=QUIZ_SIZE):
+        self.generate = generate
+        self.target = target
+        self.low_water = low_water
+        self.quiz_size = quiz_size
+        self.lock = threading.Lock()
+        self.refills = queue.Queue()
+        self.queued = set()
+        self.worker = None
+        self.stats = {'served': 0, 'generated_inline': 0, 'refills': 0, 'unavailable': 0}
+
+        self.conn = LocalDb(
+            path,
+            'CREATE TABLE IF NOT EXISTS quiz_questions ('
+            'id INTEGER PRIMARY KEY, topic TEXT NOT NULL, fingerprint TEXT NOT NULL, '
+            'question TEXT NOT NULL, created_at REAL NOT NULL, UNIQUE (topic, fingerprint))',
+            'CREATE TABLE IF NOT EXISTS quiz_served ('
+            'user TEXT NOT NULL, question_id INTEGER NOT NULL, served_at REAL NOT NULL, '
+            'PRIMARY KEY (user, question_id))'
+        )
+
+    def get_quiz(self, topic, user=None):
+        """Return a quiz in the generate_quiz shape: [{"quiz": [questions]}], or None if there are no questions.
+
+        None means the topic has no questions yet and generating them failed.
+        """
+        key = normalize_key(topic)
+        rows = self._sample(key, user)
+        if len(rows) < self.quiz_size:
+            # Cold topic, or the user has seen everything: generate now
+            self._generate_into(key, topic)
+            self.stats['generated_inline'] += 1
+            rows = self._sample(key, user)
+        if len(rows) < self.quiz_size and user:
+            rows += self._sample(key, None, exclude=[r[0] for r in rows])[:self.quiz_size - len(rows)]
+        if not rows:
+            self.stats['unavailable'] += 1
+            return None
+
+        if user and rows:
+            with self.lock:
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO quiz_served (user, question_id, served_at) VALUES (?, ?, ?)',
+                    [(user, row[0], time.time()) for row in rows]
+                )
+        self.stats['served'] += 1
+
+        if self.count(key) < self.low_water:
+            self.request_refill(topic)
+        return [{"quiz": [json.loads(row[1]) for row in rows]}]
+
+    def prewarm(self, topics):
+        """Queue topics (e.g. the courses of a new roadmap) for background generation."""
+        for topic in topics:
+            if self.count(normalize_key(topic)) < self.low_water:
+                self.request_refill(topic)
+
+    def request_refill(self, topic):
+        key = normalize_key(topic)
+        with self.lock:
+            if key in self.queued:
+                return
+            self.queued.add(key)
+            self.refills.put(topic)
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._run_worker, daemon=True)
+                self.worker.start()
+
+    def count(self, key):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM quiz_questions WHERE topic = ?', (key,)).fetchone()[0]
+
+    def _sample(self, key, user, exclude=()):
+        query = 'SELECT id, question FROM quiz_questions WHERE topic = ?'
+        params = [key]
+        if user:
+            query += ' AND id NOT IN (SELECT question_id FROM quiz_served WHERE user = ?)'
+            params.append(user)
+        if exclude:
+            query += f" AND id NOT IN ({','.join('?' * len(exclude))})"
+            params.extend(exclude)
+        query += ' ORDER BY RANDOM() LIMIT ?'
+        params.append(self.quiz_size)
+        with self.lock:
+            return self.conn.execute(query, params).fetchall()
+
+    def _generate_into(self, key, topic):
+        """Generate one quiz for a topic and add its new questions to the pool."""
+        try:
+            questions = extract_questions(self.generate(topic))
+        except Exception as e:
+            print(f"Error generating quiz for topic '{topic}': {e}")
+            return 0
+        rows = []
+        for question in questions:
+            fingerprint = hashlib.sha256(normalize_key(question['question']).encode('utf-8')).hexdigest()
+            rows.append((key, fingerprint, json.dumps(question), time.time()))
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO quiz_questions (topic, fingerprint, question, created_at) VALUES (?, ?, ?, ?)',
+                rows
+            )
+            return self.conn.total_changes - before
+
+    def _run_worker(self):
+        while True:
+            try:
+                topic = self.refills.get(timeout=60)
+            except queue.Empty:
+                # Idle: stop the worker; request_refill starts a new one when needed
+                with self.lock:
+                    if self.refills.empty():
+                        self.worker = None
+                        return
+                continue
+            key = normalize_key(topic)
+            try:
+                for _ in range(MAX_REFILL_ATTEMPTS):
+                    if self.count(key) >= self.target:
+                        break
+                    self._generate_into(key, topic)
+                self.stats['refills'] += 1
+            finally:
+                with self.lock:
+                    self.queued.discard(key)
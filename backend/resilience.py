@@ -0,0 +1,198 @@
+import functools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+from instrumentation import LLM_RETRIES, LLM_FALLBACKS
+
+# Attempts per call, including the first one
+LLM_MAX_ATTEMPTS = int(os.getenv('LLM_MAX_ATTEMPTS', 5))
+# First backoff delay and its cap, in seconds
+LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', 0.5))
+LLM_BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', 8))
+# Total time one call may spend across all of its attempts
+LLM_DEADLINE = float(os.getenv('LLM_DEADLINE', 60))
+# Consecutive failures that open the circuit, and how long it stays open
+BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', 5))
+BREAKER_RESET = float(os.getenv('LLM_BREAKER_RESET', 30))
+
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while its circuit is open."""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when retries, or waiting for the rate limiter, would run past the call's deadline."""
+
+
+_deadline = threading.local()
+
+
+def current_deadline():
+    """time.monotonic() value by which the running call has to finish, or None."""
+    return getattr(_deadline, 'at', None)
+
+
+@contextmanager
+def deadline_at(at):
+    """Run the block under a deadline; an earlier deadline already in force is kept."""
+    previous = current_deadline()
+    _deadline.at = at if previous is None else min(previous, at)
+    try:
+        yield
+    finally:
+        _deadline.at = previous
+
+
+@functools.lru_cache(maxsize=None)
+def retryable_errors():
+    """Errors worth retrying: rate limits, upstream overload and transient network problems.
+
+    Built on first use so that importing this module does not load the Google SDK.
+    """
+    from google.api_core import exceptions as google_exceptions
+    return (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.GatewayTimeout,
+        requests.ConnectionError,
+        requests.Timeout,
+        ConnectionError,
+        TimeoutError,
+    )
+
+
+def is_retryable(error):
+    return isinstance(error, retryable_errors())
+
+
+class CircuitBreaker:
+    """Fails fast after `threshold` consecutive failures, for `reset_timeout` seconds.
+
+    After the timeout one trial call is let through (half open); its outcome
+    closes the circuit again or reopens it.
+    """
+
+    def __init__(self, name, threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.stats = {'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go to the upstream now."""
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return
+            if state == 'half_open' and not self.trial_running:
+                self.trial_running = True
+                return
+            self.stats['rejected'] += 1
+        raise CircuitOpenError(f"{self.name} is unavailable, circuit open")
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+            self.stats['successes'] += 1
+
+    def record_skipped(self):
+        """The call gave up before reaching the upstream; another call may be the trial."""
+        with self.lock:
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.stats['failures'] += 1
+            if self.trial_running or self.failures >= self.threshold:
+                if self.opened_at is None or self.trial_running:
+                    self.stats['opened'] += 1
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+# Every Gemini call shares one breaker: they all depend on the same upstream and quota
+gemini_breaker = CircuitBreaker('gemini')
+
+
+def backoff_delay(attempt, base=LLM_BACKOFF_BASE, cap=LLM_BACKOFF_MAX):
+    """Exponential backoff with full jitter for the given (1-based) retry attempt."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def resilient(breaker=gemini_breaker, attempts=LLM_MAX_ATTEMPTS, deadline=LLM_DEADLINE, fallback=None):
+    """Decorator adding retries with backoff, a deadline and a circuit breaker to a call.
+
+    Retryable errors are retried with jittered exponential backoff while the
+    attempts and the deadline allow; other errors are raised at once. The
+    deadline (or an earlier one set by the caller with deadline_at) also
+    bounds the wait for the model gateway's rate limiter. If the
+    call still fails, or the circuit is open, `fallback(*args, **kwargs)` is
+    returned when given, otherwise the error is raised.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            try:
+                with deadline_at(time.monotonic() + deadline):
+                    return call(fn, args, kwargs)
+            except Exception as e:
+                if fallback is None:
+                    raise
+                print(f"{fn.__name__} failed, serving fallback: {e}")
+                LLM_FALLBACKS.inc(function=fn.__name__)
+                return fallback(*args, **kwargs)
+
+        def call(fn, args, kwargs):
+            give_up_at = current_deadline()
+            for attempt in range(1, attempts + 1):
+                breaker.before_call()
+                try:
+                    result = fn(*args, **kwargs)
+                except DeadlineExceededError:
+                    # Gave up waiting for the rate limiter; the upstream was never called
+                    breaker.record_skipped()
+                    raise
+                except Exception as e:
+                    if not is_retryable(e):
+                        # The upstream answered; the request itself was bad
+                        breaker.record_success()
+                        raise
+                    breaker.record_failure()
+                    if attempt == attempts:
+                        raise
+                    delay = backoff_delay(attempt)
+                    if time.monotonic() + delay >= give_up_at:
+                        raise DeadlineExceededError(f"{fn.__name__} gave up after {attempt} attempts: {e}") from e
+                    print(f"Retrying {fn.__name__} in {delay:.1f}s after error: {e}")
+                    LLM_RETRIES.inc(function=fn.__name__)
+                    time.sleep(delay)
+                else:
+                    breaker.record_success()
+                    return result
+
+        return wrapper
+    return decorator
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from courseCodec import dumps
+from userCache import user_cache
+
+# Number of users whose roadmap is kept in memory
+ROADMAP_CACHE_SIZE = int(os.getenv('ROADMAP_CACHE_SIZE', 1024))
+# Upper bound (in seconds) on how stale a cached roadmap can be when another instance changed it
+ROADMAP_CACHE_TTL = float(os.getenv('ROADMAP_CACHE_TTL', 60))
+
+RoadmapEntry = namedtuple('RoadmapEntry', 'courses body etag version expires_at')
+
+
+class RoadmapCache:
+    """Per-user read-through cache of the parsed roadmap and its /api/courses body.
+
+    Entries are keyed by email and remember the user's version (see
+    UserCache.version), which every write through app.user_write bumps in
+    the SQLite table shared by the workers on the instance. A write made by
+    another worker is therefore noticed on the next read, whatever backend
+    stores the roadmap. Writers in this process also call invalidate().
+    """
+
+    def __init__(self, size=ROADMAP_CACHE_SIZE, ttl=ROADMAP_CACHE_TTL, version=user_cache.version):
+        self.size = size
+        self.ttl = ttl
+        self.version = version
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def load(self, user, read):
+        """Return the cached entry for a user, or cache the roadmap returned by read()."""
+        # Taken before reading: a write committed after this point bumps the version again
+        version = self.version(user.email)
+        with self.lock:
+            entry = self.entries.get(user.email)
+            if entry and entry.version == version and entry.expires_at > time.time():
+                self.entries.move_to_end(user.email)
+                self.stats['hits'] += 1
+                return entry
+            self.entries.pop(user.email, None)
+            self.stats['misses'] += 1
+        return self._put(user, read(), version)
+
+    def _put(self, user, courses, version):
+        """Cache a freshly loaded roadmap and serialize the /api/courses body once."""
+        body = dumps({"email": user.email, "courses": courses})
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        entry = RoadmapEntry(courses, body, etag, version, time.time() + self.ttl)
+        with self.lock:
+            self.entries[user.email] = entry
+            self.entries.move_to_end(user.email)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, email):
+        with self.lock:
+            self.entries.pop(email, None)
+
+    def hit_ratio(self):
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+
+roadmap_cache = RoadmapCache()
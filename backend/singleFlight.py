@@ -0,0 +1,99 @@
+import copy
+import functools
+import re
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+def normalize_key(text):
+    """Fold case and whitespace so equivalent prompts share one key."""
+    return re.sub(r'\s+', ' ', str(text)).strip().lower()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its result.
+
+    The first caller for a key runs the function. Callers arriving while it is
+    running wait for it and get a copy of its result, or the same exception.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.stats = {'calls': 0, 'shared': 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                self.stats['calls'] += 1
+            else:
+                self.stats['shared'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+
+def single_flight(key=normalize_key):
+    """Decorator sharing one in-flight call between concurrent callers with the same key.
+
+    `key` maps the call arguments to the key; by default the normalized first argument.
+    """
+    def decorator(fn):
+        group = SingleFlight()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return group.do(key(*args, **kwargs), fn, *args, **kwargs)
+
+        wrapper.flight = group
+        return wrapper
+    return decorator
+
+
+class KeyedLock:
+    """One lock per key (e.g. per user), created on demand and dropped when unused."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.locks = {}
+        self.users = defaultdict(int)
+
+    @contextmanager
+    def hold(self, key):
+        with self.lock:
+            lock = self.locks.setdefault(key, threading.Lock())
+            self.users[key] += 1
+        try:
+            with lock:
+                yield
+        finally:
+            with self.lock:
+                self.users[key] -= 1
+                if not self.users[key]:
+                    del self.users[key]
+                    del self.locks[key]
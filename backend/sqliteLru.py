@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict
+
+from localDb import LocalDb
+
+
+class MemoryLru:
+    """In-process LRU of values with an expiry time."""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+
+    def get(self, key, now):
+        entry = self.entries.get(key)
+        if entry and entry[1] > now:
+            self.entries.move_to_end(key)
+            return entry[0]
+        self.entries.pop(key, None)
+        return None
+
+    def put(self, key, value, expires_at):
+        self.entries[key] = (value, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def items(self, now):
+        """(key, value) of the unexpired entries, least recently used first."""
+        return [(key, value) for key, (value, expires_at) in self.entries.items() if expires_at > now]
+
+
+class SqliteLru:
+    """SQLite table of expiring entries, shared by every worker on the instance.
+
+    Rows have a text `key`, the value `columns` ({name: SQL type}), `expires_at`
+    and `accessed_at`. Expired rows are dropped when read, and every write trims
+    the table to `max_entries` rows, dropping the least recently used. Callers
+    serialize access with their own lock.
+    """
+
+    def __init__(self, path, table, columns, max_entries):
+        self.table = table
+        self.columns = tuple(columns)
+        self.max_entries = max_entries
+
+        definitions = ''.join(f'{name} {kind}, ' for name, kind in columns.items())
+        self.conn = LocalDb(
+            path,
+            f'CREATE TABLE IF NOT EXISTS {table} ('
+            f'key TEXT PRIMARY KEY, {definitions}expires_at REAL NOT NULL, accessed_at REAL NOT NULL)',
+            f'CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at)'
+        )
+
+    def get(self, key, now=None):
+        """Return (value columns..., expires_at) of an unexpired row and mark it used, or None."""
+        now = now or time.time()
+        row = self.conn.execute(
+            f"SELECT {', '.join(self.columns)}, expires_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row and row[-1] > now:
+            self.conn.execute(f'UPDATE {self.table} SET accessed_at = ? WHERE key = ?', (now, key))
+            return row
+        if row:
+            self.delete(key)
+        return None
+
+    def put(self, key, values, expires_at, now=None):
+        """Insert or replace a row; returns the number of rows evicted to make room."""
+        placeholders = ', '.join('?' * (len(self.columns) + 3))
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, {', '.join(self.columns)}, expires_at, accessed_at) "
+            f"VALUES ({placeholders})", (key, *values, expires_at, now or time.time())
+        )
+        return self._evict()
+
+    def delete(self, key):
+        self.conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+
+    def _evict(self):
+        count = self.conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+        if count <= self.max_entries:
+            return 0
+        self.conn.execute(f'DELETE FROM {self.table} WHERE expires_at <= ?', (time.time(),))
+        excess = self.conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0] - self.max_entries
+        if excess > 0:
+            self.conn.execute(
+                f'DELETE FROM {self.table} WHERE key IN '
+                f'(SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?)', (excess,)
+            )
+        return count - self.conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+
+class TwoTierCache:
+    """Cache with an in-process LRU in front of a SqliteLru table.
+
+    Entries expire after `ttl` seconds. Subclasses name the `table` and its
+    value `columns` (the first one holds the cached value) and may override
+    dump()/load() to store values that are not text.
+    """
+
+    table = None
+    columns = None
+
+    def __init__(self, path, memory_size, max_entries, ttl):
+        self.ttl = ttl
+        self.memory = MemoryLru(memory_size)
+        self.disk = SqliteLru(path, self.table, self.columns, max_entries)
+        self.lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    def dump(self, value):
+        return value
+
+    def load(self, text):
+        return text
+
+    def _find(self, key, now):
+        """Value of a key from memory, then from disk; counts hits but not misses. Hold self.lock."""
+        value = self.memory.get(key, now)
+        if value is not None:
+            self.stats['memory_hits'] += 1
+            return value
+        row = self.disk.get(key, now)
+        if row is None:
+            return None
+        value = self.load(row[0])
+        self.memory.put(key, value, row[-1])
+        self.stats['disk_hits'] += 1
+        return value
+
+    def _store(self, key, value, *extra):
+        """Cache a value in both tiers; `extra` fills the other value columns."""
+        now = time.time()
+        expires_at = now + self.ttl
+        with self.lock:
+            self.memory.put(key, value, expires_at)
+            self.stats['evictions'] += self.disk.put(key, (self.dump(value), *extra), expires_at, now)
+            self.stats['writes'] += 1
+
+    def hit_ratio(self):
+        hits = sum(value for name, value in self.stats.items() if name.endswith('_hits'))
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
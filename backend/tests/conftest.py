@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+# The backend modules import each other by their top-level names
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, User  # noqa: E402
+
+
+@pytest.fixture
+def database():
+    """An app context on an empty in-memory SQLite database."""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield db
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def user(database):
+    row = User(username='ada', email='ada@example.com', password='x')
+    database.session.add(row)
+    database.session.commit()
+    return row
+
+
+def course(course_id, title=None, descriptions=False):
+    """A roadmap course, or with `descriptions` the matching detailed course."""
+    headings = ["Intro", "Setup"]
+    if descriptions:
+        return {"id": course_id, "title": title or course_id.title(), "modules": [
+            {"moduleTitle": "Basics", "headings": [{"heading": h, "description": f"About {h}"} for h in headings]}]}
+    return {"id": course_id, "title": title or course_id.title(), "description": f"About {course_id}",
+            "modules": [{"moduleTitle": "Basics", "headings": headings}]}
@@ -0,0 +1,157 @@
+import itertools
+
+import pytest
+
+import courseStore
+from clients import clients
+from conftest import course
+from courseCodec import encode
+from courseStore import CloudinaryCourseStore, StoreError, ROADMAP, COURSE, snapshot_url
+from models import db, CourseChange
+
+
+class FakeUploader:
+    """cloudinary.uploader stand-in keeping blobs in memory."""
+
+    def __init__(self):
+        self.blobs = {}
+        self.ids = itertools.count()
+        self.uploads = 0
+
+    def upload(self, body, **kwargs):
+        self.uploads += 1
+        url = f"https://res.cloudinary.com/demo/raw/upload/v1/blob{next(self.ids)}"
+        self.blobs[url] = body.read()
+        return {"secure_url": url}
+
+    def destroy(self, public_id, **kwargs):
+        self.blobs.pop(f"https://res.cloudinary.com/demo/raw/upload/v1/{public_id}", None)
+
+
+@pytest.fixture
+def uploader(monkeypatch):
+    fake = FakeUploader()
+    monkeypatch.setitem(clients.instances, 'cloudinary', fake)
+    monkeypatch.setattr(courseStore, 'fetch', lambda url: fake.blobs[url])
+    return fake
+
+
+@pytest.fixture
+def store(database, uploader):
+    return CloudinaryCourseStore(database)
+
+
+def ids(courses):
+    return [c['id'] for c in courses]
+
+
+def test_changes_are_logged_and_replayed(store, user, uploader):
+    store.add_courses(user, ROADMAP, [course('java')])
+    store.add_courses(user, ROADMAP, [course('python')])
+    store.add_courses(user, ROADMAP, [course('java', 'Java 2')])
+
+    # No write uploads a snapshot, not even the first; they are rows in the log
+    assert uploader.uploads == 0
+    assert CourseChange.query.count() == 3
+    assert user.roadmap == f"#{CourseChange.query.order_by(CourseChange.id.desc()).first().id}"
+
+    courses = store.list_courses(user, ROADMAP)
+    assert ids(courses) == ['python', 'java']
+    assert courses[1]['title'] == 'Java 2'
+
+    remaining = store.remove_course(user, 'Python')
+    assert ids(remaining) == ['java']
+    assert ids(store.list_courses(user, ROADMAP)) == ['java']
+
+
+def test_log_is_compacted_into_a_snapshot(store, user, uploader, monkeypatch):
+    monkeypatch.setattr(courseStore, 'COURSE_LOG_COMPACT_AFTER', 3)
+    for n in range(3):
+        store.add_courses(user, ROADMAP, [course(f'c{n}')])
+    assert uploader.uploads == 1
+    assert CourseChange.query.count() == 0
+    assert '#' not in user.roadmap
+    first_snapshot = user.roadmap
+
+    for n in range(3, 6):
+        store.add_courses(user, ROADMAP, [course(f'c{n}')])
+    assert uploader.uploads == 2
+    assert first_snapshot not in uploader.blobs
+    assert ids(store.list_courses(user, ROADMAP)) == ['c0', 'c1', 'c2', 'c3', 'c4', 'c5']
+
+
+def test_concurrent_first_writes_are_both_kept(store, user):
+    store.add_courses(user, ROADMAP, [course('java')])
+    # Another worker read the user before that write and also saves its first course
+    user.roadmap = None
+    store.add_courses(user, ROADMAP, [course('python')])
+
+    assert CourseChange.query.count() == 2
+    assert ids(store.list_courses(user, ROADMAP)) == ['java', 'python']
+
+
+def test_compaction_keeps_changes_logged_meanwhile(store, user):
+    store.add_courses(user, ROADMAP, [course('c0')])
+    store.add_courses(user, ROADMAP, [course('c1')])
+    upto = CourseChange.query.order_by(CourseChange.id.desc()).first().id
+    # Another worker logs a change between reading the log and committing the snapshot
+    db.session.add(CourseChange(user_id=user.id, kind=ROADMAP, op='put', payload=encode([course('c2')])))
+    db.session.commit()
+
+    store._write(user, ROADMAP, [course('c0'), course('c1')], upto=upto)
+
+    assert CourseChange.query.count() == 1
+    assert user.roadmap.endswith(f"#{CourseChange.query.one().id}")
+    assert ids(store.list_courses(user, ROADMAP)) == ['c0', 'c1', 'c2']
+
+
+def test_removing_the_last_course_clears_the_location(store, user):
+    store.add_courses(user, ROADMAP, [course('java')])
+    store.add_courses(user, COURSE, [course('java')])
+    store.add_courses(user, ROADMAP, [course('go')])
+
+    store.remove_course(user, 'Java')
+    assert user.course is None
+    store.remove_course(user, 'Go')
+    assert user.roadmap is None
+    assert CourseChange.query.count() == 0
+
+
+@pytest.mark.parametrize('courses', [None, {}, [None], [{"title": "No id"}]])
+def test_invalid_courses_are_rejected(store, user, courses):
+    store.add_courses(user, ROADMAP, [course('java')])
+    with pytest.raises(StoreError):
+        store.add_courses(user, ROADMAP, courses)
+    assert CourseChange.query.count() == 1
+
+
+def test_an_invalid_logged_change_is_skipped(store, user):
+    store.add_courses(user, ROADMAP, [course('java')])
+    # Written before add_courses checked its input
+    db.session.add(CourseChange(user_id=user.id, kind=ROADMAP, op='put', payload=encode(None)))
+    db.session.commit()
+    store.add_courses(user, ROADMAP, [course('python')])
+
+    assert ids(store.list_courses(user, ROADMAP)) == ['java', 'python']
+    store.compact(user, ROADMAP)
+    assert CourseChange.query.count() == 0
+    assert ids(store.list_courses(user, ROADMAP)) == ['java', 'python']
+
+
+def test_summaries_download_detailed_courses_only_when_asked(store, user, uploader, monkeypatch):
+    store.add_courses(user, ROADMAP, [course('java'), course('go')])
+    store.add_courses(user, COURSE, [course('java', descriptions=True)])
+    store.compact(user, ROADMAP)
+    store.compact(user, COURSE)
+    fetched = []
+    monkeypatch.setattr(courseStore, 'fetch', lambda url: fetched.append(url) or uploader.blobs[url])
+
+    summaries, total = store.list_summaries(user)
+    assert summaries == [{"id": "java", "title": "Java", "description": "About java"},
+                         {"id": "go", "title": "Go", "description": "About go"}]
+    assert total == 2
+    assert fetched == [snapshot_url(user.roadmap)]
+
+    summaries, _ = store.list_summaries(user, fields=('id', 'detailed'))
+    assert summaries == [{"id": "java", "detailed": True}, {"id": "go", "detailed": False}]
+    assert snapshot_url(user.course) in fetched
@@ -0,0 +1,14 @@
+from courseGenerator import COURSE_PROMPT_VERSION, MODULE_PROMPT_VERSION
+from descriptionCache import DescriptionCache
+
+
+def test_each_prompt_has_its_own_entries(tmp_path):
+    cache = DescriptionCache(path=str(tmp_path / 'descriptions.db'))
+    cache.set('Java Basics', 'From the module prompt', MODULE_PROMPT_VERSION)
+
+    assert cache.get('java  basics') is None
+    assert cache.get('java basics', MODULE_PROMPT_VERSION) == 'From the module prompt'
+
+    cache.set('Java Basics', 'From the heading prompt')
+    assert cache.get('Java Basics', COURSE_PROMPT_VERSION) == 'From the heading prompt'
+    assert cache.get('Java Basics', MODULE_PROMPT_VERSION) == 'From the module prompt'
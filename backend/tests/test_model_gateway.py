@@ -0,0 +1,138 @@
+import time
+
+import pytest
+
+import chatbot
+from courseEngine import PLACEHOLDER, iter_descriptions
+from modelGateway import PRIORITY_COURSE, ModelGateway
+from resilience import CircuitBreaker, DeadlineExceededError, gemini_breaker, resilient
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        return type('Response', (), {'text': prompt})()
+
+
+def drained_gateway(rpm=1):
+    """A gateway whose request bucket is empty and refills once a minute."""
+    gateway = ModelGateway(rpm=rpm, tpm=1000000, rate_db=None)
+    gateway._model = FakeModel()
+    gateway.requests.level = 0
+    return gateway
+
+
+def test_acquire_gives_up_before_the_deadline():
+    gateway = drained_gateway()
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        gateway.generate_content("prompt", PRIORITY_COURSE, deadline=start + 0.2)
+    # The next request is a minute away, so it fails at once instead of sleeping
+    assert time.monotonic() - start < 0.1
+    assert gateway._model.calls == 0
+    assert gateway.stats['course']['deadline_exceeded'] == 1
+    assert gateway.waiting == []
+
+
+def test_waiting_behind_another_caller_stops_at_the_deadline():
+    gateway = drained_gateway()
+    gateway.waiting.append((PRIORITY_COURSE - 1, -1))
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        gateway.acquire(PRIORITY_COURSE, 10, deadline=start + 0.1)
+    assert 0.1 <= time.monotonic() - start < 1
+
+
+
+def test_workers_of_an_instance_share_the_quota(tmp_path):
+    path = str(tmp_path / 'rate.db')
+    workers = [ModelGateway(rpm=2, tpm=1000000, rate_db=path) for _ in range(2)]
+    for worker in workers:
+        worker._model = FakeModel()
+        worker.generate_content("prompt")
+
+    # Two calls used the instance's two requests, whichever worker made them
+    with pytest.raises(DeadlineExceededError):
+        workers[0].generate_content("prompt", deadline=time.monotonic() + 1)
+    assert workers[1].metrics()['requests_available'] < 1
+
+
+def test_resilient_supplies_its_deadline_and_leaves_the_breaker_closed():
+    gateway = drained_gateway()
+    breaker = CircuitBreaker('test', threshold=1, reset_timeout=60)
+
+    @resilient(breaker=breaker, deadline=0.2)
+    def generate():
+        return gateway.generate_content("prompt")
+
+    with pytest.raises(DeadlineExceededError):
+        generate()
+    assert breaker.state == 'closed'
+
+
+def test_course_deadline_reaches_worker_threads():
+    gateway = drained_gateway()
+
+    @resilient(deadline=60)
+    def generate(heading):
+        return gateway.generate_content(heading).text
+
+    course = {"modules": [{"moduleTitle": "Basics", "headings": ["Intro", "Setup"]}]}
+    start = time.monotonic()
+    results = list(iter_descriptions(course, generate, concurrency=2, deadline=0.2))
+    assert sorted(results) == [(0, 0, PLACEHOLDER), (0, 1, PLACEHOLDER)]
+    time.sleep(0.3)
+    # The threads gave up with the course instead of waiting out their own 60s
+    assert gateway.waiting == []
+    assert time.monotonic() - start < 1
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class StreamingModel(FakeModel):
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        if kwargs.get('stream'):
+            return iter([Chunk("Hello"), Chunk(" there")])
+        return Chunk("answer")
+
+
+@pytest.fixture
+def half_open_breaker(monkeypatch):
+    """The shared Gemini breaker, open long enough ago to let one trial call through."""
+    monkeypatch.setattr(gemini_breaker, 'failures', gemini_breaker.threshold)
+    monkeypatch.setattr(gemini_breaker, 'opened_at', time.monotonic() - gemini_breaker.reset_timeout - 1)
+    monkeypatch.setattr(gemini_breaker, 'trial_running', False)
+    return gemini_breaker
+
+
+def test_closing_a_trial_stream_lets_the_next_call_through(half_open_breaker, monkeypatch):
+    gateway = ModelGateway(rpm=1000, tpm=1000000, rate_db=None)
+    gateway._model = StreamingModel()
+    monkeypatch.setattr(chatbot, 'gateway', gateway)
+
+    stream = chatbot.stream_bot_response("hi")
+    assert next(stream) == "Hello"
+    # The client disconnects in the middle of the answer
+    stream.close()
+
+    assert half_open_breaker.state == 'half_open'
+    assert chatbot.generate_bot_response("hi again") == "answer"
+    assert half_open_breaker.state == 'closed'
+
+
+def test_a_bad_streamed_request_closes_the_breaker(half_open_breaker, monkeypatch):
+    gateway = ModelGateway(rpm=1000, tpm=1000000, rate_db=None)
+    gateway._model = StreamingModel()
+    gateway._model.generate_content = lambda prompt, **kwargs: (_ for _ in ()).throw(ValueError("bad request"))
+    monkeypatch.setattr(chatbot, 'gateway', gateway)
+
+    with pytest.raises(ValueError):
+        list(chatbot.stream_bot_response("hi"))
+    assert half_open_breaker.state == 'closed'
@@ -0,0 +1,22 @@
+from quizPool import QuizPool
+
+
+def quiz(topic, count=10):
+    return [{"quiz": [{"question": f"{topic} question {n}?", "options": ["a", "b"], "correct": "a"}
+                      for n in range(count)]}]
+
+
+def test_a_failed_cold_topic_serves_no_quiz(tmp_path):
+    def generate(topic):
+        raise RuntimeError("circuit open")
+
+    pool = QuizPool(generate, path=str(tmp_path / 'quiz.db'), low_water=0)
+    assert pool.get_quiz('rust') is None
+    assert pool.stats['unavailable'] == 1
+
+
+def test_a_cold_topic_is_generated_inline(tmp_path):
+    pool = QuizPool(quiz, path=str(tmp_path / 'quiz.db'), low_water=0)
+    questions = pool.get_quiz('rust', user='ada@example.com')[0]['quiz']
+    assert len(questions) == 10
+    assert pool.stats['generated_inline'] == 1
@@ -0,0 +1,19 @@
+from instrumentation import RequestProfiler
+
+
+def test_one_request_is_profiled_at_a_time(tmp_path):
+    profiler = RequestProfiler(slow_ms=1, sample_rate=1, directory=str(tmp_path))
+    first = profiler.start()
+    assert first is not None
+    # A concurrent request is not sampled instead of failing to start a second profiler
+    assert profiler.start() is None
+
+    profiler.finish(first, 'GET /api/courses', 5)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    second = profiler.start()
+    assert second is not None
+    profiler.discard(second)
+    third = profiler.start()
+    assert third is not None
+    profiler.discard(third)
@@ -0,0 +1,26 @@
+from roadmapCache import RoadmapCache
+from userCache import UserCache, CachedUser
+
+USER = CachedUser(1, 'ada', 'ada@example.com', 'sql://roadmap', None)
+
+
+def test_a_write_in_another_worker_is_noticed(tmp_path):
+    path = str(tmp_path / 'users.db')
+    this_worker, other_worker = UserCache(path=path), UserCache(path=path)
+    cache = RoadmapCache(version=this_worker.version)
+
+    first = cache.load(USER, lambda: [{'id': 'java'}])
+    assert cache.load(USER, lambda: [{'id': 'unused'}]) is first
+
+    # The location stays 'sql://roadmap'; only the version tells the roadmap changed
+    other_worker.invalidate(USER.email)
+    second = cache.load(USER, lambda: [{'id': 'java'}, {'id': 'go'}])
+    assert [c['id'] for c in second.courses] == ['java', 'go']
+    assert second.etag != first.etag
+
+
+def test_entries_expire(tmp_path):
+    cache = RoadmapCache(ttl=0, version=UserCache(path=str(tmp_path / 'users.db')).version)
+    cache.load(USER, lambda: [])
+    assert cache.load(USER, lambda: [{'id': 'go'}]).courses == [{'id': 'go'}]
+    assert cache.stats == {'hits': 0, 'misses': 2}
@@ -0,0 +1,44 @@
+import pytest
+
+from conftest import course
+from courseStore import SqlCourseStore, ROADMAP, COURSE
+
+
+@pytest.fixture
+def store(database):
+    return SqlCourseStore(database)
+
+
+def summaries(store, user):
+    return store.list_summaries(user, fields=('id', 'detailed'))[0]
+
+
+def test_saving_the_same_roadmap_keeps_the_detailed_course(store, user):
+    store.add_courses(user, ROADMAP, [course('python')])
+    store.add_courses(user, COURSE, [course('python', descriptions=True)])
+    store.add_courses(user, ROADMAP, [course('python', 'Python 3')])
+
+    assert summaries(store, user) == [{'id': 'python', 'detailed': True}]
+    assert store.get_course(user, COURSE, 'python')['modules'][0]['headings'][0]['description'] == 'About Intro'
+    assert store.get_course(user, ROADMAP, 'python')['title'] == 'Python 3'
+
+
+def test_a_changed_outline_drops_the_detailed_course(store, user):
+    store.add_courses(user, ROADMAP, [course('python')])
+    store.add_courses(user, COURSE, [course('python', descriptions=True)])
+    changed = course('python')
+    changed['modules'][0]['headings'].append('Packaging')
+    store.add_courses(user, ROADMAP, [changed])
+
+    assert summaries(store, user) == [{'id': 'python', 'detailed': False}]
+    assert store.get_course(user, COURSE, 'python') is None
+    assert user.course is None
+
+
+def test_a_course_is_detailed_only_once_every_heading_has_a_description(store, user):
+    store.add_courses(user, ROADMAP, [course('go')])
+    partial = course('go', descriptions=True)
+    partial['modules'][0]['headings'][1]['description'] = None
+    store.add_courses(user, COURSE, [partial])
+
+    assert summaries(store, user) == [{'id': 'go', 'detailed': False}]
@@ -0,0 +1,63 @@
+import pytest
+
+from sqliteLru import SqliteLru
+from topicCache import TopicCache, normalize_topic
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return TopicCache(path=str(tmp_path / 'topics.db'), fuzzy_threshold=0.9)
+
+
+def test_equivalent_searches_share_a_topic():
+    assert normalize_topic('Learn Java') == normalize_topic(' java course ') == 'java'
+    assert normalize_topic('C++') != normalize_topic('C') != normalize_topic('C#')
+
+
+@pytest.mark.parametrize('query', ['pyhton programming', 'programming python', 'python programing'])
+def test_typos_and_reordered_words_match(cache, query):
+    cache.set('python programming', [{'id': 'python'}])
+    assert cache.get(query) == [{'id': 'python'}]
+
+
+@pytest.mark.parametrize('query', ['c++ programming', 'c# programming', 'r programming'])
+def test_languages_with_close_names_stay_apart(cache, query):
+    cache.set('c programming', [{'id': 'c'}])
+    assert cache.get(query) is None
+
+
+@pytest.mark.parametrize('cached, query', [
+    ('microeconomics', 'macroeconomics'),
+    ('organic chemistry', 'inorganic chemistry'),
+    ('Microbiology', 'macrobiology'),
+    ('react', 'preact'),
+    ('python programming', 'pyhton programing'),
+])
+def test_different_subjects_with_close_names_stay_apart(cache, cached, query):
+    cache.set(cached, [{'id': 'cached'}])
+    assert cache.get(query) is None
+    assert cache.stats['fuzzy_hits'] == 0
+
+
+def test_fuzzy_matching_is_off_by_default(tmp_path):
+    cache = TopicCache(path=str(tmp_path / 'topics.db'))
+    cache.set('python programming', [{'id': 'python'}])
+    assert cache.get('pyhton programming') is None
+    assert cache.get('Programming in Python') == [{'id': 'python'}]
+
+
+def test_roadmaps_are_read_back_from_disk(tmp_path, cache):
+    cache.set('rust', [{'id': 'rust'}])
+    other_worker = TopicCache(path=str(tmp_path / 'topics.db'))
+    assert other_worker.get('learn rust') == [{'id': 'rust'}]
+    assert other_worker.stats['disk_hits'] == 1
+
+
+def test_least_recently_used_rows_are_evicted(tmp_path):
+    table = SqliteLru(str(tmp_path / 'lru.db'), 'entries', {'value': 'TEXT'}, max_entries=2)
+    table.put('a', ('1',), expires_at=2e9, now=1)
+    table.put('b', ('2',), expires_at=2e9, now=2)
+    table.get('a', now=3)
+    assert table.put('c', ('3',), expires_at=2e9, now=4) == 1
+    assert table.get('b') is None
+    assert table.get('a')[0] == '1' and table.get('c')[0] == '3'
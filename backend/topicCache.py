@@ -0,0 +1,137 @@
+import copy
+import difflib
+import json
+import os
+import re
+import time
+
+from courseGenerator import MODEL_NAME, ROADMAP_PROMPT_VERSION
+from sqliteLru import TwoTierCache
+
+# SQLite file of the durable tier
+TOPIC_CACHE_DB = os.getenv('TOPIC_CACHE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'topic_cache.db'))
+# Number of topics kept in process memory (and searched for fuzzy matches)
+TOPIC_CACHE_SIZE = int(os.getenv('TOPIC_CACHE_SIZE', 256))
+# Number of topics kept in the durable tier before the least recently used are evicted
+TOPIC_CACHE_MAX_ENTRIES = int(os.getenv('TOPIC_CACHE_MAX_ENTRIES', 5000))
+# Lifetime of a cached roadmap in seconds (default 7 days)
+TOPIC_CACHE_TTL = float(os.getenv('TOPIC_CACHE_TTL', 7 * 24 * 3600))
+# Similarity (0..1) a cached topic needs to answer a query that does not match exactly; 0 (the default)
+# disables fuzzy matching, since a wrong match saves another topic's courses into the user's roadmap
+TOPIC_FUZZY_THRESHOLD = float(os.getenv('TOPIC_FUZZY_THRESHOLD', 0))
+# A fuzzy match may change one word of at least this many letters; shorter words and words with
+# symbols must be the same ("react" vs "preact", "c" vs "c++")
+FUZZY_WORD_LENGTH = 6
+# Leading letters of that word a fuzzy match may not change ("microeconomics" vs "macroeconomics")
+FUZZY_FIXED_PREFIX = 2
+# Typos (insertion, deletion, substitution or swap of neighbours) allowed in that word
+FUZZY_MAX_EDITS = 1
+
+# Words that do not change which roadmap a search asks for
+STOPWORDS = frozenset("""
+    a an the and or of for to in on with about into from by my me i we you want wanna would like please
+    how what learn learning study studying teach course courses tutorial tutorials roadmap guide intro
+    introduction basics basic beginner beginners complete full
+""".split())
+
+
+def normalize_topic(query):
+    """Token-set form of a search: case folded, punctuation and stopwords removed, tokens sorted.
+
+    "Learn Java", " java " and "java course" all become "java". Characters that
+    tell languages apart (c, c++, c#, .net) are kept.
+    """
+    tokens = re.findall(r'[\w+#.]+', str(query).lower())
+    tokens = {token.strip('.') for token in tokens} - {''}
+    kept = sorted(tokens - STOPWORDS)
+    return ' '.join(kept or sorted(tokens))
+
+
+def edit_distance(a, b):
+    """Insertions, deletions, substitutions and swaps of neighbouring letters turning a into b."""
+    rows = [list(range(len(b) + 1))] + [[i] + [0] * len(b) for i in range(1, len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            rows[i][j] = min(rows[i - 1][j] + 1, rows[i][j - 1] + 1, rows[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                rows[i][j] = min(rows[i][j], rows[i - 2][j - 2] + 1)
+    return rows[-1][-1]
+
+
+def is_typo_of(topic, other):
+    """True if two normalized topics differ only by a typo inside one long word, past its first letters."""
+    words, other_words = set(topic.split()), set(other.split())
+    changed, other_changed = words - other_words, other_words - words
+    if len(words) != len(other_words) or len(changed) != 1 or len(other_changed) != 1:
+        return False
+    word, other_word = changed.pop(), other_changed.pop()
+    return (min(len(word), len(other_word)) >= FUZZY_WORD_LENGTH and word.isalnum() and other_word.isalnum()
+            and word[:FUZZY_FIXED_PREFIX] == other_word[:FUZZY_FIXED_PREFIX]
+            and edit_distance(word, other_word) <= FUZZY_MAX_EDITS)
+
+
+def topic_key(query, model=MODEL_NAME, prompt_version=ROADMAP_PROMPT_VERSION):
+    return f"{model}|{prompt_version}|{normalize_topic(query)}"
+
+
+class TopicCache(TwoTierCache):
+    """Two tier cache of generated roadmaps, keyed by normalized search topic.
+
+    Lookups go to an in-process LRU first and then to a SQLite table. Word
+    order, case and stopwords never matter. With a fuzzy threshold, a query
+    without an exact match may also be served a topic in memory that differs
+    from it by one typo in one long word (see is_typo_of). Callers get their
+    own copy of a roadmap.
+    """
+
+    table = 'topics'
+    columns = {'roadmap': 'TEXT NOT NULL'}
+
+    def __init__(self, path=TOPIC_CACHE_DB, memory_size=TOPIC_CACHE_SIZE, max_entries=TOPIC_CACHE_MAX_ENTRIES,
+                 ttl=TOPIC_CACHE_TTL, fuzzy_threshold=TOPIC_FUZZY_THRESHOLD):
+        super().__init__(path, memory_size, max_entries, ttl)
+        self.fuzzy_threshold = fuzzy_threshold
+        self.stats['fuzzy_hits'] = 0
+
+    def dump(self, roadmap):
+        return json.dumps(roadmap)
+
+    def load(self, text):
+        return json.loads(text)
+
+    def get(self, query):
+        """Return a copy of the cached roadmap for a search query, or None."""
+        key = topic_key(query)
+        now = time.time()
+        with self.lock:
+            roadmap = self._find(key, now)
+            if roadmap is None:
+                roadmap = self._fuzzy(key, now)
+                if roadmap is not None:
+                    self.stats['fuzzy_hits'] += 1
+            if roadmap is None:
+                self.stats['misses'] += 1
+                return None
+            return copy.deepcopy(roadmap)
+
+    def set(self, query, roadmap):
+        """Store a freshly generated roadmap for a search query."""
+        self._store(topic_key(query), copy.deepcopy(roadmap))
+
+    def _fuzzy(self, key, now):
+        """Closest unexpired topic in memory with the same model and prompt version, if close enough."""
+        prefix, _, topic = key.rpartition('|')
+        if self.fuzzy_threshold <= 0:
+            return None
+        best, best_ratio = None, self.fuzzy_threshold
+        for cached_key, roadmap in self.memory.items(now):
+            cached_prefix, _, cached_topic = cached_key.rpartition('|')
+            if cached_prefix != prefix or not is_typo_of(topic, cached_topic):
+                continue
+            ratio = difflib.SequenceMatcher(None, topic, cached_topic).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = roadmap, ratio
+        return best
+
+
+topic_cache = TopicCache()
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from localDb import LocalDb
+
+# SQLite file holding a version per user, so a write in one worker invalidates the others on the instance
+USER_CACHE_DB = os.getenv('USER_CACHE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'user_cache.db'))
+# Number of users kept in memory
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 4096))
+# Upper bound (in seconds) on how stale a user can be after a write on another instance
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 30))
+
+# Read-only snapshot of a User row; the password hash is deliberately left out
+CachedUser = namedtuple('CachedUser', 'id username email roadmap course')
+_Entry = namedtuple('_Entry', 'user version expires_at')
+
+
+class UserCache:
+    """Per-process cache of the user records of authenticated requests.
+
+    Entries are snapshots keyed by email. They expire after `ttl` seconds and
+    are dropped when the user's version changes: invalidate() bumps it in a
+    SQLite table shared by every worker on the instance, which is checked on
+    each lookup (a local read instead of a database round trip).
+    """
+
+    def __init__(self, path=USER_CACHE_DB, size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+        self.conn = LocalDb(path, 'CREATE TABLE IF NOT EXISTS user_versions (email TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+
+    def get(self, email):
+        """Return the cached snapshot of a user, or None if missing, expired or changed."""
+        with self.lock:
+            entry = self.entries.get(email)
+            if entry and entry.expires_at > time.time() and entry.version == self._version(email):
+                self.entries.move_to_end(email)
+                self.stats['hits'] += 1
+                return entry.user
+            self.entries.pop(email, None)
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, row):
+        """Cache a User row freshly loaded from the database and return its snapshot."""
+        user = CachedUser(row.id, row.username, row.email, row.roadmap, row.course)
+        with self.lock:
+            self.entries[row.email] = _Entry(user, self._version(row.email), time.time() + self.ttl)
+            self.entries.move_to_end(row.email)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return user
+
+    def invalidate(self, email):
+        """Forget a user here and in the other workers, after its row changed."""
+        with self.lock:
+            self.entries.pop(email, None)
+            self.conn.execute(
+                'INSERT INTO user_versions (email, version) VALUES (?, 1) '
+                'ON CONFLICT (email) DO UPDATE SET version = version + 1', (email,)
+            )
+            self.stats['invalidations'] += 1
+
+    def version(self, email):
+        """Counter bumped by every invalidate() of a user, in any worker on the instance."""
+        with self.lock:
+            return self._version(email)
+
+    def hit_ratio(self):
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def _version(self, email):
+        row = self.conn.execute('SELECT version FROM user_versions WHERE email = ?', (email,)).fetchone()
+        return row[0] if row else 0
+
+
+user_cache = UserCache()
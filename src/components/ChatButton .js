@@ -36,6 +36,8 @@ const ChatButton = () => {
   const [messages, setMessages] = useState([]);
   const [input, setInput] = useState("");
   const [typing, setTyping] = useState(false);
+  // Id of the conversation kept by the server, so only the new message is sent
+  const [sessionId, setSessionId] = useState(null);
   const { isLoggedIn, username } = useAuth();
 
   const togglePopup = () => setOpen(!open);
@@ -60,7 +62,7 @@ const ChatButton = () => {
           headers: {
             "Content-Type": "application/json",
           },
-          body: JSON.stringify({ message: input }),
+          body: JSON.stringify({ message: input, session_id: sessionId }),
         });
 
         if (!response.ok) {
@@ -68,6 +70,7 @@ const ChatButton = () => {
         }
 
         const data = await response.json();
+        setSessionId(data.session_id);
         const botResponse = data.response; // Extract bot's response from the API response
 
         // Format the bot's response
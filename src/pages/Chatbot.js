@@ -39,6 +39,8 @@ const Chatbot = () => {
   const [input, setInput] = useState('');
   const [typing, setTyping] = useState(false);
   const [recognition, setRecognition] = useState(null);
+  // Id of the conversation kept by the server, so only the new message is sent
+  const [sessionId, setSessionId] = useState(null);
 
   const { isLoggedIn,username} = useAuth();
   
@@ -80,7 +82,7 @@ const Chatbot = () => {
           headers: {
             'Content-Type': 'application/json',
           },
-          body: JSON.stringify({ message: input }),
+          body: JSON.stringify({ message: input, session_id: sessionId }),
         });
 
         if (!response.ok) {
@@ -88,6 +90,7 @@ const Chatbot = () => {
         }
 
         const data = await response.json();
+        setSessionId(data.session_id);
         const botResponse = data.response; // Get the response from Flask
 
         // Format the bot's response using the formatText function